@@ -0,0 +1,293 @@
+# --- Benchmarks da app do ateliê ---
+# Gera inventários sintéticos, serve-os pelo substituto local do Supabase (supabase_local.py, com
+# latência configurável) e mede carga, filtros, agregação, desenho das páginas e exportação em PDF,
+# com o pico de memória de cada etapa. Os resultados saem em JSON para comparar versões:
+#
+#   python benchmarks/benchmark_atelie.py --tamanhos 1000 10000 --saida atual.json
+#   python benchmarks/benchmark_atelie.py --tamanhos 1000 10000 --comparar base.json
+#
+# As etapas "app.*" correm o script Streamlit inteiro com streamlit.testing (AppTest). As fotos são
+# descarregadas por HTTP do servidor local, com a mesma latência e contagem de pedidos que o resto.
+# O pico de memória vem do tracemalloc e só conta o processo do benchmark: no "exportar.pdf" ficam de
+# fora os processos que desenham as secções dos relatórios grandes (ver relatorio_pdf.gerar_relatorio).
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+import uuid
+from datetime import date, datetime
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+import supabase_local
+import relatorio_pdf
+from gravacao_atelie import url_publica
+from modelo_atelie import Peca, IndicePecas, Agregados, SimulacaoRecalculo
+from PIL import Image
+
+SCRIPT_APP = os.path.join(RAIZ, "app_final_atelie.py")
+PESSOAS = ["Ana", "Bia", "Caio", "Duda", "Edu", "Fabi", "Gabi", "Hugo", "Iara", "João", "Lia", "Mia"]
+TIPOS = ["Copo", "Vaso", "Prato", "Tigela", "Caneca", "Travessa", "Bule", "Luminária"]
+FOTOS_DISTINTAS = 16
+TAMANHOS_FOTO = ("original", "thumb", "medio", "impressao")
+# Regressão: uma etapa mais lenta do que isto (razão nova/antiga) é assinalada em --comparar.
+LIMIAR_REGRESSAO = 1.10
+
+
+# --- Dados sintéticos ---
+def gerar_fotos(n=FOTOS_DISTINTAS, seed=0):
+    """Fotos JPEG com ruído (não comprimem bem, como fotos reais), no tamanho típico de um telemóvel reduzido."""
+    aleatorio = random.Random(seed)
+    fotos = []
+    for _ in range(n):
+        img = Image.effect_noise((800, 600), aleatorio.randint(30, 90)).convert("RGB")
+        buffer = io.BytesIO()
+        img.save(buffer, format="JPEG", quality=85)
+        fotos.append(buffer.getvalue())
+    return fotos
+
+
+def gerar_inventario(n, user_id, com_fotos, seed=0):
+    """`n` linhas no formato de Peca.to_dict, com custos calculados e ~3% de datas inválidas."""
+    aleatorio = random.Random(seed)
+    inicio = date(2023, 1, 1).toordinal()
+    linhas = []
+    for i in range(n):
+        if aleatorio.random() < 0.03:
+            data_producao = "sem data"
+        else:
+            data_producao = date.fromordinal(inicio + aleatorio.randrange(3 * 365)).strftime("%d/%m/%Y")
+        peca_id = str(uuid.UUID(int=aleatorio.getrandbits(128)))
+        tipo_argila = aleatorio.choice(["atelie", "propria", "nenhuma"])
+        peca = Peca(data_producao, aleatorio.choice(PESSOAS), aleatorio.choice(TIPOS),
+                    round(aleatorio.uniform(0.1, 4.0), 3), round(aleatorio.uniform(3, 40), 1),
+                    round(aleatorio.uniform(3, 40), 1), round(aleatorio.uniform(3, 40), 1),
+                    tipo_argila, round(aleatorio.uniform(4, 12), 2), peca_id=peca_id, user_id=user_id,
+                    image_path=f"{peca_id}/original.jpg" if com_fotos else None, data_registro="01/01/2025")
+        linhas.append(peca.to_dict())
+    return linhas
+
+
+def preparar_servidor(n, com_fotos, latencia, fotos):
+    """Servidor partilhado da app preenchido com `n` peças de um utilizador novo. Devolve (servidor, user, session)."""
+    servidor = supabase_local.servidor_partilhado()
+    servidor.reiniciar()
+    cliente = supabase_local.create_client(servidor)
+    resposta = cliente.auth.sign_up({"email": f"bench-{n}@atelie.test", "password": "bench"})
+    user_id = resposta.user.id
+    linhas = gerar_inventario(n, user_id, com_fotos)
+    servidor.inserir_direto('pecas', linhas)
+    if com_fotos:
+        for i, linha in enumerate(linhas):
+            foto = fotos[i % len(fotos)]
+            for tamanho in TAMANHOS_FOTO:
+                servidor.ficheiros[f"fotos-pecas/{user_id}/{linha['id']}/{tamanho}.jpg"] = (foto, "image/jpeg")
+    servidor.latencia = latencia
+    return servidor, resposta.user.dict(), resposta.session.dict(), linhas
+
+
+# --- Medição ---
+def medir(funcao, repeticoes=1, memoria=True):
+    """Corre `funcao` `repeticoes` vezes. Devolve (resultado da última, {tempos}, pico de memória em bytes ou None).
+
+    O pico vem de uma corrida extra sob tracemalloc, para não pesar nos tempos.
+    """
+    tempos, resultado = [], None
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        resultado = funcao()
+        tempos.append(time.perf_counter() - inicio)
+    pico = None
+    if memoria:
+        tracemalloc.start()
+        try:
+            funcao()
+            pico = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+    return resultado, {"mediana_s": statistics.median(tempos), "minimo_s": min(tempos), "repeticoes": len(tempos)}, pico
+
+
+def _app(user, session, caminho_cache):
+    import streamlit as st
+    from streamlit.testing.v1 import AppTest
+    os.environ["ATELIE_CACHE_LOCAL"] = caminho_cache
+    st.cache_resource.clear()  # get_cache_local guarda o caminho da cache (e a pasta) da corrida anterior
+    at = AppTest.from_file(SCRIPT_APP, default_timeout=3600)
+    at.session_state.user = user
+    at.session_state.session = session
+    return at
+
+
+def _verificar(at, etapa):
+    if at.exception:
+        raise RuntimeError(f"{etapa}: {at.exception[0].message}")
+
+
+def _correr(etapa, execucao):
+    """Corre `execucao()` (um AppTest.run) e falha se a app escrever um erro da cache local: a medição
+    seria de outra coisa (ex.: uma carga fria em vez de uma carga a partir da cache)."""
+    saida = io.StringIO()
+    with contextlib.redirect_stdout(saida):
+        at = execucao()
+    erros = [l for l in saida.getvalue().splitlines() if "cache local" in l.lower()]
+    if erros:
+        raise RuntimeError(f"{etapa}: " + "; ".join(erros))
+    _verificar(at, etapa)
+    return at
+
+
+def _obter_fotos_pdf(servidor):
+    """O pré-carregamento da app (relatorio_pdf.prefetch_fotos), com uma cache de fotos nova por exportação."""
+    cliente = supabase_local.create_client(servidor)
+    cache = relatorio_pdf.CacheFotos(relatorio_pdf.LIMITE_CACHE_FOTOS_BYTES)
+    return lambda pecas: relatorio_pdf.prefetch_fotos(pecas, lambda peca: url_publica(cliente, peca, 'impressao'), cache)
+
+
+def correr_cenario(n, com_fotos, args, fotos):
+    servidor, user, session, linhas = preparar_servidor(n, com_fotos, args.latencia, fotos)
+    cenario = {"pecas": n, "fotos": com_fotos, "latencia_s": args.latencia}
+    resultados = []
+
+    def registar(etapa, funcao, repeticoes=args.repeticoes, **extra):
+        pedidos_antes = servidor.pedidos
+        resultado, tempos, pico = medir(funcao, repeticoes, not args.sem_memoria)
+        corridas = repeticoes + (0 if args.sem_memoria else 1)
+        linha = {**cenario, "etapa": etapa, **tempos, "pico_memoria_bytes": pico,
+                 "pedidos_por_corrida": (servidor.pedidos - pedidos_antes) // corridas, **extra}
+        resultados.append(linha)
+        print(f"  {etapa:<28} {tempos['mediana_s']:9.4f} s"
+              + (f"  {pico / 2**20:8.1f} MiB" if pico is not None else ""), flush=True)
+        return resultado
+
+    # Modelo (sem Streamlit nem rede)
+    pecas = registar("modelo.from_dict", lambda: [Peca.from_dict(d) for d in linhas])
+    indice = registar("modelo.indice", lambda: IndicePecas(pecas))
+    registar("filtro.pessoa", lambda: indice.consultar(("Ana", "Bia")))
+    registar("filtro.intervalo", lambda: indice.consultar(inicio=date(2024, 3, 1), fim=date(2024, 5, 31)))
+    registar("agregacao.lista", lambda: Agregados(pecas).resumo(('nome_pessoa',)))
+    registar("agregacao.incremental", lambda: (indice.agregados.resumo(('nome_pessoa',)),
+                                               indice.agregados.resumo(('mes',)),
+                                               indice.agregados.resumo(('tipo_peca',))))
+    registar("recalculo.simulacao", lambda: SimulacaoRecalculo().processar(linhas))
+
+    # App completa (script Streamlit) sobre o substituto local
+    with tempfile.TemporaryDirectory(prefix="bench_atelie_") as pasta:
+        contador = iter(range(10**6))
+
+        def carga_fria():
+            at = _app(user, session, os.path.join(pasta, f"fria_{next(contador)}.sqlite3"))
+            return _correr("app.carga_fria", at.run)
+        at = registar("app.carga_fria", carga_fria, repeticoes=1)
+        caminho_cache = os.environ["ATELIE_CACHE_LOCAL"]
+
+        def carga_com_cache():
+            at = _app(user, session, caminho_cache)
+            return _correr("app.carga_com_cache", at.run)
+        registar("app.carga_com_cache", carga_com_cache, repeticoes=1)
+
+        paginas = iter(["Ver Relatório Completo", "Adicionar Nova Peça"] * 10**3)
+        def relatorio():
+            pagina = next(paginas)
+            _correr("app.relatorio", at.sidebar.radio(key="menu_radio").set_value(pagina).run)
+            if pagina != "Ver Relatório Completo":  # a medição é sempre de ir para o relatório
+                _correr("app.relatorio", at.sidebar.radio(key="menu_radio").set_value("Ver Relatório Completo").run)
+        registar("app.relatorio", relatorio)
+
+        modos = iter(["Ano", "Todas"] * 10**3)
+        def filtro_ano():
+            _correr("app.filtro", at.selectbox[0].set_value(next(modos)).run)
+        registar("app.filtro", filtro_ano)
+
+        def pagina_seguinte():
+            entrada = at.number_input(key="pagina_relatorio")
+            _correr("app.pagina_seguinte", entrada.set_value(entrada.value % int(entrada.max) + 1).run)
+        registar("app.pagina_seguinte", pagina_seguinte)
+
+    # Exportação
+    amostra = pecas[:args.max_pecas_pdf] if args.max_pecas_pdf else pecas
+    resumo = Agregados(amostra).resumo(('nome_pessoa',))
+    def pdf():
+        saida = io.BytesIO()
+        relatorio_pdf.gerar_relatorio(amostra, resumo, _obter_fotos_pdf(servidor), saida, args.processos)
+        return saida.tell()
+    # Com mais de uma secção, o desenho corre noutros processos e o pico de memória deles não é medido.
+    registar("exportar.pdf", pdf, repeticoes=1, pecas_exportadas=len(amostra),
+             pico_memoria_so_processo_principal=True)
+    return resultados
+
+
+def _commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=RAIZ, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except Exception:
+        return None
+
+
+def comparar(resultados, caminho_base):
+    """Imprime a razão novo/antigo da mediana de cada etapa e devolve quantas passaram LIMIAR_REGRESSAO."""
+    with open(caminho_base, encoding="utf-8") as ficheiro:
+        base = {(r["pecas"], r["fotos"], r["etapa"]): r for r in json.load(ficheiro)["resultados"]}
+    regressoes = 0
+    print(f"\nComparação com {caminho_base}:")
+    for r in resultados:
+        antigo = base.get((r["pecas"], r["fotos"], r["etapa"]))
+        if not antigo or not antigo["mediana_s"]: continue
+        razao = r["mediana_s"] / antigo["mediana_s"]
+        marca = "  <-- regressão" if razao > LIMIAR_REGRESSAO else ""
+        regressoes += bool(marca)
+        print(f"  {r['pecas']:>7} {'c/ fotos' if r['fotos'] else 's/ fotos'} {r['etapa']:<28} "
+              f"{antigo['mediana_s']:9.4f} -> {r['mediana_s']:9.4f} s  ({razao:5.2f}x){marca}")
+    return regressoes
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__ or "Benchmarks da app do ateliê")
+    parser.add_argument("--tamanhos", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--fotos", choices=["sem", "com", "ambos"], default="ambos")
+    parser.add_argument("--latencia", type=float, default=0.02, help="segundos por pedido ao Supabase local")
+    parser.add_argument("--repeticoes", type=int, default=3)
+    parser.add_argument("--processos", type=int, default=os.cpu_count() or 1, help="processos para o PDF")
+    parser.add_argument("--max-pecas-pdf", type=int, default=5000, help="0 = todas")
+    parser.add_argument("--sem-memoria", action="store_true", help="não medir o pico de memória (mais rápido)")
+    parser.add_argument("--saida", help="ficheiro JSON para os resultados")
+    parser.add_argument("--comparar", help="JSON de uma corrida anterior para comparar")
+    args = parser.parse_args(argv)
+
+    os.environ["ATELIE_BACKEND"] = "local"
+    os.environ.setdefault("ATELIE_LOG_DESEMPENHO", os.devnull)  # uma linha JSON por execução da app
+    fotos = gerar_fotos()
+    variantes = {"sem": [False], "com": [True], "ambos": [False, True]}[args.fotos]
+    resultados = []
+    for n in args.tamanhos:
+        for com_fotos in variantes:
+            print(f"{n} peças, {'com' if com_fotos else 'sem'} fotos:", flush=True)
+            resultados.extend(correr_cenario(n, com_fotos, args, fotos))
+
+    relatorio = {
+        "data": datetime.now().isoformat(timespec="seconds"), "commit": _commit(),
+        "python": platform.python_version(), "plataforma": platform.platform(), "cpus": os.cpu_count(),
+        "parametros": vars(args), "resultados": resultados,
+    }
+    if args.saida:
+        with open(args.saida, "w", encoding="utf-8") as ficheiro:
+            json.dump(relatorio, ficheiro, indent=2, ensure_ascii=False)
+        print(f"\nResultados em {args.saida}")
+    if args.comparar:
+        return 1 if comparar(resultados, args.comparar) else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
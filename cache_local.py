@@ -0,0 +1,104 @@
+# --- Cache local (SQLite) do inventário ---
+# Guarda por utilizador as linhas de 'pecas' (como vêm do Supabase / Peca.to_dict()), as peças
+# ainda por gravar no servidor (com a foto) e alguns metadados da carga. Cada operação abre a sua
+# ligação, por isso pode ser usado ao mesmo tempo pelo script e pela thread da fila de gravação.
+import json
+import sqlite3
+import time
+
+_ESQUEMA = """
+create table if not exists pecas (
+    user_id text not null,
+    id text not null,
+    created_at text,
+    dados text not null,
+    primary key (user_id, id)
+);
+create index if not exists pecas_ordem on pecas (user_id, created_at);
+create table if not exists pendentes (
+    user_id text not null,
+    id text not null,
+    dados text not null,
+    foto blob,
+    criado_em real not null,
+    primary key (user_id, id)
+);
+create table if not exists meta (
+    user_id text not null,
+    chave text not null,
+    valor text,
+    primary key (user_id, chave)
+);
+"""
+
+
+class CacheLocal:
+    def __init__(self, caminho):
+        self.caminho = caminho
+        ligacao = self._ligar()
+        try:
+            ligacao.execute("pragma journal_mode=wal")
+            ligacao.executescript(_ESQUEMA)
+        finally:
+            ligacao.close()
+
+    def _ligar(self):
+        return sqlite3.connect(self.caminho, timeout=30)
+
+    def _executar(self, sql, parametros=()):
+        ligacao = self._ligar()
+        try:
+            with ligacao:
+                return ligacao.execute(sql, parametros).fetchall()
+        finally:
+            ligacao.close()
+
+    def _executar_varios(self, sql, parametros):
+        ligacao = self._ligar()
+        try:
+            with ligacao:
+                ligacao.executemany(sql, parametros)
+        finally:
+            ligacao.close()
+
+    # Linhas de 'pecas'
+    def carregar(self, user_id):
+        """Linhas do utilizador, das mais recentes para as mais antigas (as ainda sem 'created_at' primeiro)."""
+        linhas = self._executar(
+            "select dados from pecas where user_id = ? order by created_at is null desc, created_at desc, rowid desc",
+            (user_id,))
+        return [json.loads(dados) for dados, in linhas]
+
+    def guardar(self, user_id, linhas):
+        """Insere ou substitui linhas; um 'created_at' já conhecido não é apagado por uma versão local sem ele."""
+        self._executar_varios(
+            "insert into pecas (user_id, id, created_at, dados) values (?, ?, ?, ?) "
+            "on conflict (user_id, id) do update set dados = excluded.dados, "
+            "created_at = coalesce(excluded.created_at, pecas.created_at)",
+            [(user_id, l['id'], l.get('created_at'), json.dumps(l)) for l in linhas])
+
+    def remover(self, user_id, ids):
+        self._executar_varios("delete from pecas where user_id = ? and id = ?", [(user_id, i) for i in ids])
+        self._executar_varios("delete from pendentes where user_id = ? and id = ?", [(user_id, i) for i in ids])
+
+    # Metadados (ex.: offset da carga inicial por acabar)
+    def get_meta(self, user_id, chave, padrao=None):
+        linhas = self._executar("select valor from meta where user_id = ? and chave = ?", (user_id, chave))
+        return json.loads(linhas[0][0]) if linhas else padrao
+
+    def set_meta(self, user_id, chave, valor):
+        self._executar("insert or replace into meta (user_id, chave, valor) values (?, ?, ?)",
+                       (user_id, chave, json.dumps(valor)))
+
+    # Peças escritas localmente e ainda não gravadas no Supabase
+    def adicionar_pendente(self, user_id, dados, foto=None):
+        self._executar("insert or replace into pendentes (user_id, id, dados, foto, criado_em) values (?, ?, ?, ?, ?)",
+                       (user_id, dados['id'], json.dumps(dados), foto, time.time()))
+
+    def remover_pendente(self, user_id, peca_id):
+        self._executar("delete from pendentes where user_id = ? and id = ?", (user_id, peca_id))
+
+    def listar_pendentes(self, user_id):
+        """[(dados, foto)] pela ordem em que foram criadas."""
+        linhas = self._executar("select dados, foto from pendentes where user_id = ? order by criado_em", (user_id,))
+        return [(json.loads(dados), foto) for dados, foto in linhas]
@@ -0,0 +1,265 @@
+# --- Medições de desempenho (sem Streamlit) ---
+# Conta e cronometra as chamadas ao Supabase (tabelas, rpc e storage) e outras operações marcadas
+# com Medicoes.medir, com os bytes que passaram em cada sentido. Cada sessão tem um Medicoes; cada
+# execução do script abre uma "execução" nova e a anterior é fechada e escrita no log estruturado
+# (uma linha JSON no logger 'atelie.desempenho'). O trabalho das threads de fundo entre execuções
+# (fila de gravação, PDF gerado no download) fica numa execução "em segundo plano".
+# Os bytes das consultas são estimados serializando os dados em JSON, o que custa tanto como a
+# resposta é grande: só se contam com Medicoes.contar_bytes ligado (senão ficam a 0).
+import cProfile
+import io
+import json
+import logging
+import marshal
+import pstats
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from datetime import datetime
+
+# Execuções fechadas guardadas por sessão (para o painel).
+HISTORICO_EXECUCOES = 20
+
+registo = logging.getLogger("atelie.desempenho")
+
+
+def tamanho_json(dados):
+    """Bytes do JSON de `dados`: aproximação do que passa na rede num pedido ao Supabase."""
+    if dados is None: return 0
+    try:
+        return len(json.dumps(dados, default=str, separators=(',', ':')).encode('utf-8'))
+    except (TypeError, ValueError):
+        return 0
+
+
+class Execucao:
+    """Totais por (categoria, operação) de uma execução do script: [chamadas, segundos, máximo, enviados, recebidos, erros]."""
+
+    def __init__(self, numero, contexto):
+        self.numero = numero  # None = trabalho em segundo plano entre execuções
+        self.contexto = dict(contexto)
+        self.inicio = time.time()
+        self._inicio_perf = time.perf_counter()
+        self.duracao_s = None
+        self.completa = False
+        self.operacoes = {}
+
+    def registar(self, categoria, operacao, segundos, enviados=0, recebidos=0, erro=False):
+        totais = self.operacoes.setdefault((categoria, operacao), [0, 0.0, 0.0, 0, 0, 0])
+        totais[0] += 1
+        totais[1] += segundos
+        totais[2] = max(totais[2], segundos)
+        totais[3] += enviados
+        totais[4] += recebidos
+        totais[5] += erro
+
+    def linhas(self):
+        """Uma linha por operação, das que levaram mais tempo para as que levaram menos."""
+        linhas = [{"categoria": categoria, "operacao": operacao, "chamadas": chamadas, "segundos": round(segundos, 6),
+                   "max_s": round(maximo, 6), "bytes_enviados": enviados, "bytes_recebidos": recebidos, "erros": erros}
+                  for (categoria, operacao), (chamadas, segundos, maximo, enviados, recebidos, erros)
+                  in self.operacoes.items()]
+        return sorted(linhas, key=lambda l: -l["segundos"])
+
+    def totais(self):
+        chamadas = sum(t[0] for t in self.operacoes.values())
+        return {"chamadas": chamadas, "segundos": round(sum(t[1] for t in self.operacoes.values()), 6),
+                "bytes_enviados": sum(t[3] for t in self.operacoes.values()),
+                "bytes_recebidos": sum(t[4] for t in self.operacoes.values())}
+
+    def to_dict(self):
+        return {"evento": "execucao" if self.numero is not None else "segundo_plano", "numero": self.numero,
+                **self.contexto, "inicio": datetime.fromtimestamp(self.inicio).isoformat(timespec="milliseconds"),
+                "duracao_s": None if self.duracao_s is None else round(self.duracao_s, 6),
+                "completa": self.completa, "totais": self.totais(), "operacoes": self.linhas()}
+
+
+class Medicoes:
+    """Medições de uma sessão do browser. Seguro para usar a partir de várias threads."""
+
+    def __init__(self, historico=HISTORICO_EXECUCOES):
+        self._lock = threading.Lock()
+        self._numero = 0
+        self.atual = Execucao(None, {})
+        self.anteriores = deque(maxlen=historico)
+        self.contar_bytes = False
+
+    def iniciar_execucao(self, **contexto):
+        """Fecha a execução anterior (incompleta se o script parou a meio, ex.: st.rerun) e abre uma nova."""
+        with self._lock:
+            self._fechar()
+            self._numero += 1
+            self.atual = Execucao(self._numero, contexto)
+
+    def anotar(self, **contexto):
+        with self._lock:
+            self.atual.contexto.update(contexto)
+
+    def terminar_execucao(self):
+        """Fecha a execução atual (o script chegou ao fim); o que vier depois é trabalho em segundo plano."""
+        with self._lock:
+            execucao = self.atual
+            execucao.duracao_s = time.perf_counter() - execucao._inicio_perf
+            execucao.completa = True
+            self._fechar()
+            self.atual = Execucao(None, {k: v for k, v in execucao.contexto.items() if k in ("sessao", "user_id", "bytes_medidos")})
+            return execucao
+
+    def _fechar(self):
+        # Chamado com o lock. O segundo plano só fica registado se tiver havido alguma operação.
+        execucao = self.atual
+        if execucao.numero is None and not execucao.operacoes: return
+        if execucao.numero is None:
+            execucao.duracao_s = time.perf_counter() - execucao._inicio_perf
+        self.anteriores.append(execucao)
+        if registo.isEnabledFor(logging.INFO):
+            registo.info(json.dumps(execucao.to_dict(), ensure_ascii=False, default=str))
+
+    def registar(self, categoria, operacao, segundos, enviados=0, recebidos=0, erro=False):
+        with self._lock:
+            self.atual.registar(categoria, operacao, segundos, enviados, recebidos, erro)
+
+    @contextmanager
+    def medir(self, categoria, operacao):
+        """Cronometra o bloco. O dicionário devolvido aceita 'enviados' e 'recebidos' (bytes)."""
+        medida = {"enviados": 0, "recebidos": 0}
+        inicio, erro = time.perf_counter(), False
+        try:
+            yield medida
+        except Exception:
+            erro = True
+            raise
+        finally:
+            self.registar(categoria, operacao, time.perf_counter() - inicio, medida["enviados"], medida["recebidos"], erro)
+
+
+# --- Cliente Supabase medido ---
+class _ConsultaMedida:
+    """Envolve um construtor de consulta do postgrest: cada encadeamento devolve outro envolvido e o execute() é medido."""
+
+    _OPERACOES = ('select', 'insert', 'upsert', 'update', 'delete')
+
+    def __init__(self, consulta, medicoes, alvo, operacao='select', enviados=0):
+        self._consulta = consulta
+        self._medicoes = medicoes
+        self._alvo = alvo
+        self._operacao = operacao
+        self._enviados = enviados
+
+    def __getattr__(self, nome):
+        atributo = getattr(self._consulta, nome)
+        if not callable(atributo): return atributo
+
+        def _encadear(*args, **kwargs):
+            operacao, enviados = self._operacao, self._enviados
+            if nome in self._OPERACOES:
+                operacao = nome
+                if nome in ('insert', 'upsert', 'update') and args and self._medicoes.contar_bytes:
+                    enviados = tamanho_json(args[0])
+            return _ConsultaMedida(atributo(*args, **kwargs), self._medicoes, self._alvo, operacao, enviados)
+        return _encadear
+
+    def execute(self):
+        with self._medicoes.medir(self._alvo, self._operacao) as medida:
+            medida["enviados"] = self._enviados
+            resposta = self._consulta.execute()
+            if self._medicoes.contar_bytes:
+                medida["recebidos"] = tamanho_json(resposta.data)
+        return resposta
+
+
+class _BucketMedido:
+    def __init__(self, bucket, medicoes, alvo):
+        self._bucket = bucket
+        self._medicoes = medicoes
+        self._alvo = alvo
+
+    def upload(self, path, file, *args, **kwargs):
+        with self._medicoes.medir(self._alvo, "upload") as medida:
+            medida["enviados"] = len(file) if isinstance(file, (bytes, bytearray)) else 0
+            return self._bucket.upload(path, file, *args, **kwargs)
+
+    def download(self, path, *args, **kwargs):
+        with self._medicoes.medir(self._alvo, "download") as medida:
+            dados = self._bucket.download(path, *args, **kwargs)
+            medida["recebidos"] = len(dados)
+            return dados
+
+    def remove(self, paths):
+        with self._medicoes.medir(self._alvo, "remove") as medida:
+            if self._medicoes.contar_bytes:
+                medida["enviados"] = tamanho_json(paths)
+            return self._bucket.remove(paths)
+
+    def get_public_url(self, path, *args, **kwargs):
+        with self._medicoes.medir(self._alvo, "get_public_url"):
+            return self._bucket.get_public_url(path, *args, **kwargs)
+
+    def __getattr__(self, nome):
+        return getattr(self._bucket, nome)
+
+
+class _StorageMedido:
+    def __init__(self, storage, medicoes):
+        self._storage = storage
+        self._medicoes = medicoes
+
+    def from_(self, nome):
+        return _BucketMedido(self._storage.from_(nome), self._medicoes, f"storage:{nome}")
+
+    def __getattr__(self, nome):
+        return getattr(self._storage, nome)
+
+
+class ClienteMedido:
+    """Envolve um cliente Supabase (ou o de supabase_local): tabelas, rpc e storage ficam medidos, o resto (auth) passa direto."""
+
+    def __init__(self, cliente, medicoes):
+        self.cliente = cliente
+        self.medicoes = medicoes
+
+    def table(self, nome):
+        return _ConsultaMedida(self.cliente.table(nome), self.medicoes, f"tabela:{nome}")
+
+    def rpc(self, nome, *args, **kwargs):
+        return _ConsultaMedida(self.cliente.rpc(nome, *args, **kwargs), self.medicoes, f"rpc:{nome}", "chamar")
+
+    @property
+    def storage(self):
+        return _StorageMedido(self.cliente.storage, self.medicoes)
+
+    def __getattr__(self, nome):
+        return getattr(self.cliente, nome)
+
+
+# --- Perfil (cProfile) de uma execução ---
+# Um perfil de cada vez por processo. A partir do Python 3.12 o cProfile usa sys.monitoring, que é global:
+# um segundo enable() (outra sessão, ou outra ferramenta como um depurador) lança ValueError, e o perfil
+# regista as chamadas de todas as threads durante a execução (outras sessões, fila de gravação), não só as dela.
+_LOCK_PERFIL = threading.Lock()
+
+
+def iniciar_perfil():
+    """Liga o perfil, ou devolve None se já houver outro ativo no processo."""
+    if not _LOCK_PERFIL.acquire(blocking=False):
+        return None
+    perfil = cProfile.Profile()
+    try:
+        perfil.enable()
+    except ValueError:
+        _LOCK_PERFIL.release()
+        return None
+    return perfil
+
+
+def terminar_perfil(perfil, linhas=40):
+    """Pára o perfil. Devolve {'texto': as `linhas` funções com mais tempo acumulado, 'dados': ficheiro .prof (pstats)}."""
+    try:
+        perfil.disable()
+    finally:
+        _LOCK_PERFIL.release()
+    texto = io.StringIO()
+    pstats.Stats(perfil, stream=texto).strip_dirs().sort_stats("cumulative").print_stats(linhas)
+    perfil.create_stats()
+    return {"texto": texto.getvalue(), "dados": marshal.dumps(perfil.stats)}
@@ -0,0 +1,273 @@
+# --- Gravação de peças e fotos no Supabase (sem Streamlit) ---
+# Fotos: cada foto é guardada em <user_id>/<peca_id>/<tamanho>.jpg, com o original e os tamanhos
+# derivados. FilaGravacao grava as peças novas numa thread própria; recebe o cliente Supabase (ou o de
+# supabase_local) e, opcionalmente, a CacheLocal onde ficam as peças ainda por gravar.
+import io
+import threading
+import time
+from collections import OrderedDict
+from PIL import Image, ImageOps
+from relatorio_pdf import para_rgb
+
+NOME_BUCKET_FOTOS = "fotos-pecas"
+
+# Tamanhos derivados guardados junto da foto original (lado maior, em px).
+TAMANHOS_FOTO = {"thumb": 160, "medio": 400, "impressao": 240}
+
+# Fila de gravação em segundo plano: tentativas e espera exponencial entre elas (segundos).
+MAX_TENTATIVAS_GRAVACAO = 5
+ESPERA_BASE_GRAVACAO = 2.0
+ESPERA_MAX_GRAVACAO = 60.0
+# Quanto uma exclusão espera (segundos) que terminem as gravações já em curso das peças a excluir.
+ESPERA_MAX_RESERVA = 30.0
+
+
+def preparar_fotos(file_bytes):
+    """Corrige a orientação (EXIF), recodifica em JPEG e gera os tamanhos derivados. Devolve {tamanho: bytes}."""
+    img = para_rgb(ImageOps.exif_transpose(Image.open(io.BytesIO(file_bytes))))
+    fotos = {}
+    buffer = io.BytesIO()
+    img.save(buffer, format="JPEG", quality=90)
+    fotos["original"] = buffer.getvalue()
+    for tamanho, lado in TAMANHOS_FOTO.items():
+        copia = img.copy()
+        copia.thumbnail((lado, lado), Image.LANCZOS)
+        buffer = io.BytesIO()
+        copia.save(buffer, format="JPEG", quality=85)
+        fotos[tamanho] = buffer.getvalue()
+    return fotos
+
+
+def caminhos_foto(peca):
+    """Todos os caminhos no bucket que pertencem à foto da peça (original e derivados)."""
+    if not peca.image_path:
+        return []
+    caminhos = [f"{peca.user_id}/{peca.image_path}"]
+    if "/" in peca.image_path:
+        pasta = peca.image_path.split("/")[0]
+        caminhos += [f"{peca.user_id}/{pasta}/{tamanho}.jpg" for tamanho in TAMANHOS_FOTO]
+    return caminhos
+
+
+def url_publica(cliente, peca, tamanho=None):
+    """URL pública da foto. Com `tamanho` (ex.: 'thumb'), usa o derivado quando a peça o tem. None se não houver foto."""
+    if not peca.image_path:
+        return None
+    caminho = f"{peca.user_id}/{peca.image_path}"
+    if tamanho in TAMANHOS_FOTO and "/" in peca.image_path:
+        pasta = peca.image_path.split("/")[0]
+        caminho = f"{peca.user_id}/{pasta}/{tamanho}.jpg"
+    return cliente.storage.from_(NOME_BUCKET_FOTOS).get_public_url(caminho)
+
+
+def enviar_fotos(peca, file_bytes, cliente):
+    """Envia a foto e os tamanhos derivados para <user_id>/<peca_id>/<tamanho>.jpg. Devolve os caminhos enviados.
+
+    Se algum envio falhar, apaga os que já tinham subido e relança a exceção.
+    """
+    bucket = cliente.storage.from_(NOME_BUCKET_FOTOS)
+    caminhos_enviados = []
+    try:
+        for tamanho, foto_bytes in preparar_fotos(file_bytes).items():
+            image_storage_path = f"{peca.user_id}/{peca.id}/{tamanho}.jpg"
+            bucket.upload(
+                path=image_storage_path, file=foto_bytes,
+                file_options={"content-type": "image/jpeg", "upsert": "true"}
+            )
+            caminhos_enviados.append(image_storage_path)
+    except Exception:
+        if caminhos_enviados:
+            bucket.remove(caminhos_enviados)
+        raise
+    peca.image_path = f"{peca.id}/original.jpg"
+    return caminhos_enviados
+
+
+class FilaGravacao:
+    """Fila write-behind: as peças novas entram logo no inventário e uma thread grava-as no Supabase.
+
+    Cada item é tentado até MAX_TENTATIVAS_GRAVACAO vezes, com espera exponencial entre tentativas;
+    depois fica como 'falhou' até o utilizador pedir nova tentativa ou descartar. A gravação usa
+    upsert, por isso repetir uma tentativa que chegou a gravar não duplica a peça.
+    Com `cache`, cada peça fica também na tabela de pendentes da cache local até ser gravada, para que
+    um reinício da app (ou uma falta de rede prolongada) não a perca.
+    """
+
+    def __init__(self, cliente, cache=None):
+        self.cliente = cliente
+        self.cache = cache
+        self.itens = OrderedDict()  # peca_id -> item
+        self.concluidas = 0
+        self.sessao_renovada = None  # sessão renovada pela thread, por adotar pela app (tomar_sessao_renovada)
+        self._cond = threading.Condition()
+        self._thread = None
+
+    def __contains__(self, peca_id):
+        with self._cond:
+            return peca_id in self.itens
+
+    def __len__(self):
+        with self._cond:
+            return len(self.itens)
+
+    def estado(self):
+        """Cópia dos itens para mostrar na interface: [(peca, estado, tentativas, erro)]."""
+        with self._cond:
+            return [(i["peca"], i["estado"], i["tentativas"], i["erro"]) for i in self.itens.values()]
+
+    def enfileirar(self, peca, foto_bytes=None, persistir=True):
+        if persistir:
+            self._na_cache("adicionar_pendente", peca.user_id, peca.to_dict(), foto_bytes)
+        with self._cond:
+            self.itens[peca.id] = {"peca": peca, "foto": foto_bytes, "caminhos": None, "tentativas": 0,
+                                   "estado": "pendente", "erro": None, "proxima": 0.0, "cancelado": False}
+            self._acordar()
+
+    def tentar_novamente(self, peca_id):
+        with self._cond:
+            item = self.itens.get(peca_id)
+            if item and item["estado"] == "falhou":
+                item.update(estado="pendente", tentativas=0, proxima=0.0)
+                self._acordar()
+
+    def esvaziar(self):
+        """Esquece todos os itens e deixa a thread terminar (mudança de utilizador). Os pendentes continuam na
+        cache local e voltam à fila no próximo login do dono."""
+        with self._cond:
+            self.itens.clear()
+            self._cond.notify_all()
+
+    def reservar(self, ids, espera_max=None):
+        """Suspende as peças ainda por gravar (ex.: durante uma exclusão no servidor). Devolve os ids suspensos.
+
+        Uma peça que a thread já está a gravar não pode ser suspensa: o upsert dela chegaria ao servidor
+        depois do delete e a peça voltaria. Espera-se que essas gravações terminem (até `espera_max`
+        segundos, ESPERA_MAX_RESERVA por omissão); se não terminarem, lança TimeoutError sem suspender nada.
+        """
+        espera_max = ESPERA_MAX_RESERVA if espera_max is None else espera_max
+        with self._cond:
+            def _livres():
+                return not any(self.itens.get(i, {}).get("estado") == "a_gravar" for i in ids)
+            if not self._cond.wait_for(_livres, timeout=espera_max):
+                raise TimeoutError("Há peças a ser gravadas neste momento; tente excluir de novo daqui a pouco.")
+            reservadas = []
+            for peca_id in ids:
+                item = self.itens.get(peca_id)
+                if item and item["estado"] in ("pendente", "falhou"):
+                    item["estado_anterior"], item["estado"] = item["estado"], "reservada"
+                    reservadas.append(peca_id)
+            return reservadas
+
+    def libertar(self, ids):
+        """Devolve à fila as peças suspensas com reservar (a exclusão falhou)."""
+        with self._cond:
+            for peca_id in ids:
+                item = self.itens.get(peca_id)
+                if item and item["estado"] == "reservada":
+                    item["estado"] = item.pop("estado_anterior")
+            self._acordar()
+
+    def cancelar(self, ids):
+        """Retira peças da fila (ex.: excluídas antes de serem gravadas). Devolve as que ainda tinham fotos enviadas."""
+        with self._cond:
+            retiradas = []
+            for peca_id in ids:
+                item = self.itens.get(peca_id)
+                if item is None: continue
+                if item["estado"] == "a_gravar":
+                    item["cancelado"] = True  # a thread apaga a linha quando terminar
+                else:
+                    del self.itens[peca_id]
+                    retiradas.append(item["peca"])
+                self._na_cache("remover_pendente", item["peca"].user_id, peca_id)
+            return retiradas
+
+    def _na_cache(self, metodo, *args):
+        if self.cache is None: return
+        try:
+            getattr(self.cache, metodo)(*args)
+        except Exception as e:
+            print(f"Erro ao escrever na cache local: {e}")
+
+    def _acordar(self):
+        # Chamado com o lock: arranca a thread se não houver nenhuma ativa. notify_all porque uma
+        # exclusão pode estar à espera na mesma condição (reservar).
+        self._cond.notify_all()
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._trabalhar, name="fila-gravacao", daemon=True)
+            self._thread.start()
+
+    def _proximo(self):
+        agora, espera = time.monotonic(), None
+        for item in self.itens.values():
+            if item["estado"] != "pendente": continue
+            restante = item["proxima"] - agora
+            if restante <= 0: return item, None
+            espera = restante if espera is None else min(espera, restante)
+        return None, espera
+
+    def _trabalhar(self):
+        while True:
+            with self._cond:
+                item, espera = self._proximo()
+                if item is None:
+                    if espera is None:
+                        self._thread = None
+                        return
+                    self._cond.wait(espera)
+                    continue
+                item["estado"] = "a_gravar"
+            try:
+                self._gravar(item)
+            except Exception as e:
+                with self._cond:
+                    item["tentativas"] += 1
+                    item["erro"] = str(e)
+                    if item["cancelado"]:
+                        self.itens.pop(item["peca"].id, None)
+                    elif item["tentativas"] >= MAX_TENTATIVAS_GRAVACAO:
+                        item["estado"] = "falhou"
+                    else:
+                        espera = min(ESPERA_BASE_GRAVACAO * 2 ** (item["tentativas"] - 1), ESPERA_MAX_GRAVACAO)
+                        item.update(estado="pendente", proxima=time.monotonic() + espera)
+                    self._cond.notify_all()
+                print(f"Erro ao gravar a peça {item['peca'].id} (tentativa {item['tentativas']}): {e}")
+            else:
+                peca = item["peca"]
+                if not item["cancelado"]:
+                    # A cópia local passa a ser a linha do servidor (com 'created_at' e a foto já enviada).
+                    self._na_cache("guardar", peca.user_id, [item.get("linha") or peca.to_dict()])
+                self._na_cache("remover_pendente", peca.user_id, peca.id)
+                with self._cond:
+                    self.itens.pop(peca.id, None)
+                    self.concluidas += 1
+                    self._cond.notify_all()
+
+    def _gravar(self, item):
+        peca = item["peca"]
+        if item["foto"] is not None and item["caminhos"] is None:
+            item["caminhos"] = self._executar(lambda: enviar_fotos(peca, item["foto"], self.cliente))
+            item["foto"] = None
+        resposta = self._executar(lambda: self.cliente.table('pecas').upsert(peca.to_dict()).execute())
+        item["linha"] = resposta.data[0] if resposta.data else None
+        if item["cancelado"]:
+            self._executar(lambda: self.cliente.table('pecas').delete().eq('id', peca.id).execute())
+            if item["caminhos"]:
+                self._executar(lambda: self.cliente.storage.from_(NOME_BUCKET_FOTOS).remove(item["caminhos"]))
+
+    def _executar(self, pedido):
+        # Como o executar_com_renovacao da app, mas sem st.session_state (que a thread não vê): a sessão
+        # renovada fica em sessao_renovada e o script adota-a na execução seguinte (adotar_sessao_da_fila).
+        try:
+            return pedido()
+        except Exception as e:
+            if "JWT" not in str(e): raise
+        resposta = self.cliente.auth.refresh_session()
+        with self._cond:
+            self.sessao_renovada = resposta.session.dict()
+        return pedido()
+
+    def tomar_sessao_renovada(self):
+        with self._cond:
+            sessao, self.sessao_renovada = self.sessao_renovada, None
+            return sessao
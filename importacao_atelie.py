@@ -0,0 +1,134 @@
+# --- Importação em lote de peças (CSV / JSON / ZIP com fotos), sem Streamlit ---
+# Lê o ficheiro, valida cada linha com as regras do formulário, envia as fotos em paralelo e insere as
+# peças em lotes. Recebe o cliente Supabase (ou o de supabase_local); juntar as peças ao inventário da
+# sessão fica a cargo da app.
+import csv
+import io
+import json
+import math
+import os
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+from gravacao_atelie import NOME_BUCKET_FOTOS, enviar_fotos
+from modelo_atelie import Peca
+
+# Linhas por insert e uploads de fotos em paralelo.
+TAMANHO_LOTE_INSERCAO = 200
+MAX_UPLOADS_SIMULTANEOS = 6
+
+COLUNAS_IMPORTACAO = ["data_producao", "nome_pessoa", "tipo_peca", "peso_kg", "altura_cm", "largura_cm",
+                      "profundidade_cm", "tipo_argila", "preco_argila_propria", "foto"]
+
+
+def _ler_tabela(nome, dados_bytes):
+    if nome.lower().endswith(".json"):
+        linhas = json.loads(dados_bytes.decode("utf-8-sig"))
+        if isinstance(linhas, dict): linhas = [linhas]
+        return [(i + 1, linha) for i, linha in enumerate(linhas)]
+    texto = dados_bytes.decode("utf-8-sig")
+    try:
+        dialeto = csv.Sniffer().sniff(texto[:4096], delimiters=",;\t")
+    except csv.Error:
+        dialeto = csv.excel
+    # Número da linha no ficheiro (o cabeçalho é a linha 1).
+    return [(i + 2, linha) for i, linha in enumerate(csv.DictReader(io.StringIO(texto), dialect=dialeto))]
+
+
+def ler_ficheiro_importacao(nome, dados_bytes):
+    """Lê um CSV, JSON ou ZIP (tabela + fotos). Devolve ([(nº da linha, dicionário)], {nome da foto: bytes})."""
+    if not nome.lower().endswith(".zip"):
+        return _ler_tabela(nome, dados_bytes), {}
+    with zipfile.ZipFile(io.BytesIO(dados_bytes)) as arquivo:
+        nomes = [n for n in arquivo.namelist() if not n.endswith("/")]
+        tabelas = [n for n in nomes if n.lower().endswith((".csv", ".json"))]
+        if len(tabelas) != 1:
+            raise ValueError("O ZIP deve conter exatamente um ficheiro .csv ou .json com as peças.")
+        linhas = _ler_tabela(tabelas[0], arquivo.read(tabelas[0]))
+        fotos = {os.path.basename(n): arquivo.read(n) for n in nomes
+                 if n.lower().endswith((".png", ".jpg", ".jpeg"))}
+    return linhas, fotos
+
+
+def _numero(valor):
+    if valor is None or str(valor).strip() == "": return 0.0
+    return float(str(valor).strip().replace(",", "."))
+
+
+def validar_linha_importacao(linha, user_id):
+    """Converte uma linha importada em Peca, com as mesmas regras do formulário. Lança ValueError se inválida."""
+    texto = {c: str(linha.get(c) or "").strip() for c in ("data_producao", "nome_pessoa", "tipo_peca", "tipo_argila")}
+    if not texto["nome_pessoa"] or not texto["tipo_peca"] or not texto["data_producao"]:
+        raise ValueError("Nome, Tipo e Data são obrigatórios.")
+    tipo_argila = texto["tipo_argila"].lower() or "nenhuma"
+    if tipo_argila not in ("propria", "atelie", "nenhuma"):
+        raise ValueError(f"tipo_argila inválido: '{texto['tipo_argila']}' (use propria, atelie ou nenhuma).")
+    try:
+        medidas = {c: _numero(linha.get(c)) for c in ("peso_kg", "altura_cm", "largura_cm", "profundidade_cm", "preco_argila_propria")}
+    except ValueError as e:
+        raise ValueError(f"Valor numérico inválido: {e}")
+    if not all(math.isfinite(v) for v in medidas.values()):
+        raise ValueError("Medidas e preços têm de ser números finitos (sem nan/inf).")
+    if medidas["peso_kg"] <= 0:
+        raise ValueError("O peso não pode ser zero.")
+    if any(v < 0 for v in medidas.values()):
+        raise ValueError("Medidas e preços não podem ser negativos.")
+    return Peca(data_producao=texto["data_producao"], nome_pessoa=texto["nome_pessoa"], tipo_peca=texto["tipo_peca"],
+                tipo_argila=tipo_argila, user_id=user_id, **medidas)
+
+
+def importar_pecas(cliente, linhas, fotos=None, user_id=None, progresso=None, executar=None):
+    """Valida, envia as fotos em paralelo e insere as peças em lotes.
+
+    `linhas` é uma lista de (nº da linha, dicionário) como a de ler_ficheiro_importacao. Devolve
+    {"importadas": [Peca], "falhas": [(nº da linha, mensagem)]}. Quando o insert de um lote falha,
+    as fotos desse lote são apagadas do bucket para não ficarem órfãs. `executar` corre cada pedido ao
+    servidor (a app passa executar_com_renovacao, que renova a sessão quando o JWT expira).
+    """
+    executar = executar or (lambda pedido: pedido())
+    fotos = fotos or {}
+    falhas, validas = [], []
+    for numero, linha in linhas:
+        try:
+            peca = validar_linha_importacao(linha, user_id)
+        except ValueError as e:
+            falhas.append((numero, str(e))); continue
+        nome_foto = str(linha.get("foto") or "").strip()
+        if nome_foto and nome_foto not in fotos:
+            falhas.append((numero, f"Foto '{nome_foto}' não encontrada no ZIP.")); continue
+        validas.append((numero, peca, nome_foto))
+
+    def _enviar(item):
+        numero, peca, nome_foto = item
+        if not nome_foto:
+            return item, [], None
+        try:
+            return item, enviar_fotos(peca, fotos[nome_foto], cliente), None
+        except Exception as e:
+            return item, [], f"Erro ao fazer upload da foto: {e}"
+
+    prontas = []  # (numero, peca, caminhos enviados)
+    com_foto = sum(1 for _, _, nome_foto in validas if nome_foto)
+    if com_foto:
+        with ThreadPoolExecutor(max_workers=min(MAX_UPLOADS_SIMULTANEOS, com_foto)) as executor:
+            for (numero, peca, _), caminhos, erro in executor.map(_enviar, validas):
+                if erro: falhas.append((numero, erro))
+                else: prontas.append((numero, peca, caminhos))
+    else:
+        prontas = [(numero, peca, []) for numero, peca, _ in validas]
+
+    importadas = []
+    for inicio in range(0, len(prontas), TAMANHO_LOTE_INSERCAO):
+        lote = prontas[inicio:inicio + TAMANHO_LOTE_INSERCAO]
+        try:
+            executar(lambda: cliente.table('pecas').insert([peca.to_dict() for _, peca, _ in lote]).execute())
+            importadas.extend(peca for _, peca, _ in lote)
+        except Exception as e:
+            caminhos_lote = [c for _, _, caminhos in lote for c in caminhos]
+            if caminhos_lote:
+                try:
+                    executar(lambda: cliente.storage.from_(NOME_BUCKET_FOTOS).remove(caminhos_lote))
+                except Exception as erro_remocao:
+                    print(f"Erro ao apagar fotos órfãs da importação: {erro_remocao}")
+            falhas.extend((numero, f"Erro ao salvar o lote: {e}") for numero, _, _ in lote)
+        if progresso: progresso(min(inicio + TAMANHO_LOTE_INSERCAO, len(prontas)), len(prontas))
+    return {"importadas": importadas, "falhas": sorted(falhas)}
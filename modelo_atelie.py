@@ -0,0 +1,498 @@
+# --- Modelo de dados do ateliê (sem Streamlit, importável por outros módulos) ---
+from bisect import bisect_left, bisect_right, insort
+from datetime import date, datetime
+import uuid
+import numpy as np
+
+# --- Parte 2: Definição das Constantes ---
+# Preços base: valem desde sempre, até à primeira versão da tabela de preços (ver HistoricoPrecos).
+PRECO_BISCOITO_POR_KG = 13.0
+PRECO_ESMALTE_POR_CM3 = 0.013
+PRECO_ARGILA_ATELIE_KG = 7.0
+
+# --- Tabelas de preços com data de entrada em vigor ---
+class TabelaPrecos:
+    """Uma versão dos preços do ateliê, válida para peças produzidas a partir de `vigente_desde` (date; None = desde sempre)."""
+
+    __slots__ = ('vigente_desde', 'preco_biscoito_kg', 'preco_esmalte_cm3', 'preco_argila_atelie_kg')
+
+    def __init__(self, vigente_desde, preco_biscoito_kg, preco_esmalte_cm3, preco_argila_atelie_kg):
+        self.vigente_desde = vigente_desde
+        self.preco_biscoito_kg = float(preco_biscoito_kg)
+        self.preco_esmalte_cm3 = float(preco_esmalte_cm3)
+        self.preco_argila_atelie_kg = float(preco_argila_atelie_kg)
+
+    def to_dict(self):
+        return {"vigente_desde": self.vigente_desde.isoformat() if self.vigente_desde else None,
+                "preco_biscoito_kg": self.preco_biscoito_kg, "preco_esmalte_cm3": self.preco_esmalte_cm3,
+                "preco_argila_atelie_kg": self.preco_argila_atelie_kg}
+
+    @classmethod
+    def from_dict(cls, data_dict):
+        vigente_desde = data_dict.get('vigente_desde')
+        if isinstance(vigente_desde, str):
+            vigente_desde = date.fromisoformat(vigente_desde[:10])
+        return cls(vigente_desde, data_dict['preco_biscoito_kg'], data_dict['preco_esmalte_cm3'],
+                   data_dict['preco_argila_atelie_kg'])
+
+TABELA_PRECOS_BASE = TabelaPrecos(None, PRECO_BISCOITO_POR_KG, PRECO_ESMALTE_POR_CM3, PRECO_ARGILA_ATELIE_KG)
+
+class HistoricoPrecos:
+    """Versões da tabela de preços ordenadas pela data de entrada em vigor, sempre a começar pela TABELA_PRECOS_BASE.
+
+    Cada peça é custeada com a versão em vigor na sua data de produção; sem data de produção válida,
+    usa a data de registo e, sem nenhuma das duas, a versão mais recente.
+    `carregado` diz se as versões já vieram do Supabase (a app só o liga depois de uma leitura bem-sucedida).
+    """
+
+    def __init__(self, tabelas=()):
+        self.substituir(tabelas)
+        self.carregado = False
+
+    def substituir(self, tabelas):
+        # O histórico é partilhado por todas as sessões: o estado novo é montado à parte e trocado numa
+        # só atribuição, para quem esteja a ler ao mesmo tempo ver o antigo ou o novo, nunca uma mistura.
+        tabelas = sorted((t for t in tabelas if t.vigente_desde is not None), key=lambda t: t.vigente_desde)
+        tabelas = [TABELA_PRECOS_BASE] + tabelas
+        ordinais = [0] + [t.vigente_desde.toordinal() for t in tabelas[1:]]
+        colunas = {nome: np.array([getattr(t, nome) for t in tabelas], dtype=np.float64)
+                   for nome in ('preco_biscoito_kg', 'preco_esmalte_cm3', 'preco_argila_atelie_kg')}
+        self._estado = (tabelas, ordinais, colunas)
+
+    @property
+    def tabelas(self):
+        return self._estado[0]
+
+    def __len__(self):
+        return len(self.tabelas)
+
+    def atual(self):
+        return self.tabela_no_dia(date.today())
+
+    def tabela_no_dia(self, dia):
+        tabelas, ordinais, _ = self._estado
+        return tabelas[bisect_right(ordinais, dia.toordinal()) - 1]
+
+    def tabela_em(self, data_producao, data_registro=None):
+        tabelas, ordinais, _ = self._estado
+        ordinal = ordinal_data(data_producao) or ordinal_data(data_registro)
+        if ordinal is None:
+            return tabelas[-1]
+        return tabelas[bisect_right(ordinais, ordinal) - 1]
+
+    def precos_por_ordinal(self, ordinais):
+        """Versão vetorizada de tabela_em: um array de preços por coluna; ordinais <= 0 = sem data (versão mais recente)."""
+        tabelas, vigencias, colunas = self._estado
+        ordinais = np.asarray(ordinais, dtype=np.int64)
+        posicoes = np.searchsorted(np.asarray(vigencias, dtype=np.int64), ordinais, side='right') - 1
+        posicoes = np.where(ordinais > 0, posicoes, len(tabelas) - 1)
+        return {nome: coluna[posicoes] for nome, coluna in colunas.items()}
+
+# Histórico usado por omissão em Peca e Inventario; a app substitui-o pelas versões guardadas no Supabase.
+HISTORICO_PRECOS = HistoricoPrecos()
+
+# --- Parte 3: A "Classe" Peca ---
+class Peca:
+    """O "molde" para cada peça de cerâmica com as regras 9.0."""
+
+    __slots__ = ('id', 'user_id', 'data_producao', 'nome_pessoa', 'tipo_peca', 'peso_kg', 'altura_cm',
+                 'largura_cm', 'profundidade_cm', 'tipo_argila', 'preco_argila_propria', 'data_registro',
+                 'image_path', 'custo_argila', 'custo_biscoito', 'custo_esmalte', 'total')
+
+    def __init__(self, data_producao, nome_pessoa, tipo_peca, peso_kg, altura_cm, largura_cm, profundidade_cm,
+                 tipo_argila='nenhuma', preco_argila_propria=0.0,
+                 image_path=None, peca_id=None, user_id=None, data_registro=None, recalcular=True):
+
+        self.id = peca_id if peca_id else str(uuid.uuid4())
+        self.user_id = user_id
+        self.data_producao = data_producao
+        self.nome_pessoa = nome_pessoa
+        self.tipo_peca = tipo_peca
+        self.peso_kg = float(peso_kg)
+        self.altura_cm = float(altura_cm)
+        self.largura_cm = float(largura_cm)
+        self.profundidade_cm = float(profundidade_cm)
+        self.tipo_argila = tipo_argila
+        self.preco_argila_propria = float(preco_argila_propria) if self.tipo_argila == 'propria' else 0.0
+        self.data_registro = data_registro or date.today().strftime("%d/%m/%Y")
+        self.image_path = image_path
+
+        self.custo_argila = 0.0
+        self.custo_biscoito = 0.0
+        self.custo_esmalte = 0.0
+        self.total = 0.0
+        # Peças lidas da base de dados já trazem os custos guardados (ver from_dict).
+        if recalcular:
+            self.recalcular_custos()
+
+    def recalcular_custos(self, historico=None):
+        """Custos com a tabela de preços em vigor na data de produção da peça."""
+        precos = (historico or HISTORICO_PRECOS).tabela_em(self.data_producao, self.data_registro)
+        if self.tipo_argila == 'atelie':
+            self.custo_argila = self.peso_kg * precos.preco_argila_atelie_kg
+        elif self.tipo_argila == 'propria':
+            self.custo_argila = self.peso_kg * self.preco_argila_propria
+        else:
+            self.custo_argila = 0.0
+        self.custo_biscoito = self.peso_kg * precos.preco_biscoito_kg
+        volume_cm3 = self.altura_cm * self.largura_cm * self.profundidade_cm
+        self.custo_esmalte = volume_cm3 * precos.preco_esmalte_cm3
+        self.total = self.custo_biscoito + self.custo_esmalte + self.custo_argila
+
+    def to_dict(self):
+        return {
+            "id": self.id, "user_id": self.user_id, "data_producao": self.data_producao,
+            "nome_pessoa": self.nome_pessoa, "tipo_peca": self.tipo_peca, "peso_kg": self.peso_kg,
+            "altura_cm": self.altura_cm, "largura_cm": self.largura_cm, "profundidade_cm": self.profundidade_cm,
+            "tipo_argila": self.tipo_argila, "preco_argila_propria": self.preco_argila_propria,
+            "data_registro": self.data_registro, "image_path": self.image_path,
+            "custo_argila": self.custo_argila, "custo_biscoito": self.custo_biscoito,
+            "custo_esmalte": self.custo_esmalte, "total": self.total
+        }
+
+    @classmethod
+    def from_dict(cls, data_dict):
+        peca = cls(
+            peca_id=data_dict.get('id'), user_id=data_dict.get('user_id'),
+            data_producao=data_dict.get('data_producao'), nome_pessoa=data_dict.get('nome_pessoa'),
+            tipo_peca=data_dict.get('tipo_peca'),
+            peso_kg=float(data_dict.get('peso_kg', 0)), altura_cm=float(data_dict.get('altura_cm', 0)),
+            largura_cm=float(data_dict.get('largura_cm', 0)), profundidade_cm=float(data_dict.get('profundidade_cm', 0)),
+            tipo_argila=data_dict.get('tipo_argila', 'nenhuma'), preco_argila_propria=float(data_dict.get('preco_argila_propria', 0)),
+            image_path=data_dict.get('image_path'), data_registro=data_dict.get('data_registro'), recalcular=False
+        )
+        peca.custo_argila = float(data_dict.get('custo_argila', 0))
+        peca.custo_biscoito = float(data_dict.get('custo_biscoito', 0))
+        peca.custo_esmalte = float(data_dict.get('custo_esmalte', 0))
+        peca.total = float(data_dict.get('total', 0))
+        return peca
+
+# --- Inventário em colunas (NumPy) ---
+class _Textos:
+    """Tabela de strings internadas: cada texto distinto é guardado uma vez e referido por um código inteiro."""
+
+    __slots__ = ('codigos', 'valores')
+
+    def __init__(self):
+        self.codigos = {}
+        self.valores = []
+
+    def codigo(self, texto):
+        codigo = self.codigos.get(texto)
+        if codigo is None:
+            codigo = self.codigos[texto] = len(self.valores)
+            self.valores.append(texto)
+        return codigo
+
+class Inventario:
+    """Peças guardadas em colunas: medidas e custos em arrays float64, textos repetidos internados.
+
+    Serve para reprecificar muitas linhas de uma vez (ver SimulacaoRecalculo): os custos são
+    calculados de forma vetorizada sobre as colunas inteiras. O inventário da sessão continua a ser
+    o IndicePecas, que mantém os Agregados usados pelos resumos do relatório.
+    """
+
+    COLUNAS_NUMERICAS = ('peso_kg', 'altura_cm', 'largura_cm', 'profundidade_cm', 'preco_argila_propria',
+                         'custo_argila', 'custo_biscoito', 'custo_esmalte', 'total')
+    COLUNAS_TEXTO = ('user_id', 'data_producao', 'nome_pessoa', 'tipo_peca', 'tipo_argila', 'data_registro')
+
+    def __init__(self, capacidade=1024):
+        self._n = 0
+        self._capacidade = max(int(capacidade), 1)
+        self.numeros = {c: np.zeros(self._capacidade, dtype=np.float64) for c in self.COLUNAS_NUMERICAS}
+        self.codigos = {c: np.zeros(self._capacidade, dtype=np.int32) for c in self.COLUNAS_TEXTO}
+        self.textos = {c: _Textos() for c in self.COLUNAS_TEXTO}
+
+    def __len__(self):
+        return self._n
+
+    def _garantir_capacidade(self, n):
+        if n <= self._capacidade: return
+        while self._capacidade < n:
+            self._capacidade *= 2
+        for colunas in (self.numeros, self.codigos):
+            for nome, array in colunas.items():
+                novo = np.zeros(self._capacidade, dtype=array.dtype)
+                novo[:self._n] = array[:self._n]
+                colunas[nome] = novo
+
+    def coluna(self, nome):
+        """Vista (sem cópia) da coluna numérica com as linhas ocupadas."""
+        return self.numeros[nome][:self._n]
+
+    def extend(self, linhas, recalcular=False):
+        """Junta peças (Peca ou dicionários no formato de to_dict). Sem `recalcular`, confia nos custos já guardados."""
+        linhas = [l.to_dict() if isinstance(l, Peca) else l for l in linhas]
+        inicio = self._n
+        self._garantir_capacidade(inicio + len(linhas))
+        fim = inicio + len(linhas)
+        for nome in self.COLUNAS_NUMERICAS:
+            self.numeros[nome][inicio:fim] = [float(l.get(nome) or 0) for l in linhas]
+        for nome in self.COLUNAS_TEXTO:
+            textos = self.textos[nome]
+            self.codigos[nome][inicio:fim] = [textos.codigo(l.get(nome)) for l in linhas]
+        self._n = fim
+        # Mesma regra de Peca: o preço da argila própria só conta com tipo_argila == 'propria'.
+        fatia = slice(inicio, fim)
+        self.numeros['preco_argila_propria'][fatia] *= self._mascara_argila('propria')[fatia]
+        if recalcular:
+            self.recalcular_custos(fatia)
+
+    @classmethod
+    def from_dicts(cls, linhas, recalcular=False):
+        linhas = list(linhas)
+        inventario = cls(capacidade=len(linhas))
+        inventario.extend(linhas, recalcular=recalcular)
+        return inventario
+
+    def _mascara_argila(self, tipo):
+        codigo = self.textos['tipo_argila'].codigos.get(tipo)
+        if codigo is None:
+            return np.zeros(self._capacidade, dtype=bool)
+        mascara = self.codigos['tipo_argila'] == codigo
+        mascara[self._n:] = False
+        return mascara
+
+    def _ordinais(self, nome, fatia):
+        # Ordinal da data de cada linha, calculado uma vez por texto distinto (0 = data inválida).
+        ordinais = np.array([ordinal_data(t) or 0 for t in self.textos[nome].valores] or [0], dtype=np.int64)
+        return ordinais[self.codigos[nome][fatia]]
+
+    def recalcular_custos(self, fatia=None, historico=None):
+        """Versão vetorizada de Peca.recalcular_custos sobre todas as linhas (ou só `fatia`)."""
+        fatia = fatia or slice(0, self._n)
+        c = {nome: array[fatia] for nome, array in self.numeros.items()}
+        atelie = self._mascara_argila('atelie')[fatia]
+        propria = self._mascara_argila('propria')[fatia]
+        ordinais = self._ordinais('data_producao', fatia)
+        ordinais = np.where(ordinais > 0, ordinais, self._ordinais('data_registro', fatia))
+        precos = (historico or HISTORICO_PRECOS).precos_por_ordinal(ordinais)
+        c['custo_argila'][:] = np.where(atelie, c['peso_kg'] * precos['preco_argila_atelie_kg'],
+                                        np.where(propria, c['peso_kg'] * c['preco_argila_propria'], 0.0))
+        c['custo_biscoito'][:] = c['peso_kg'] * precos['preco_biscoito_kg']
+        c['custo_esmalte'][:] = c['altura_cm'] * c['largura_cm'] * c['profundidade_cm'] * precos['preco_esmalte_cm3']
+        c['total'][:] = c['custo_biscoito'] + c['custo_esmalte'] + c['custo_argila']
+
+# --- Recálculo de custos em lote ---
+COLUNAS_CUSTO = ('custo_argila', 'custo_biscoito', 'custo_esmalte', 'total')
+
+class SimulacaoRecalculo:
+    """Diferença (sem gravar nada) entre os custos guardados e os do histórico de preços.
+
+    `processar` recebe lotes de linhas no formato de Peca.to_dict e reprecifica cada lote de forma
+    vetorizada (Inventario.recalcular_custos). Ficam em `alteradas` só as linhas cujo custo muda
+    em pelo menos um cêntimo, já com os custos novos, prontas para um upsert.
+    """
+
+    def __init__(self, historico=None):
+        self.historico = historico or HISTORICO_PRECOS
+        self.analisadas = 0
+        self.alteradas = []
+        self.total_antes = 0.0
+        self.total_depois = 0.0
+        self.por_pessoa = {}  # nome_pessoa -> [quantidade alterada, total antes, total depois]
+
+    def processar(self, linhas):
+        linhas = list(linhas)
+        if not linhas: return self
+        inventario = Inventario.from_dicts(linhas)
+        antes = {nome: inventario.coluna(nome).copy() for nome in COLUNAS_CUSTO}
+        inventario.recalcular_custos(historico=self.historico)
+        depois = {nome: inventario.coluna(nome) for nome in COLUNAS_CUSTO}
+        mudou = np.zeros(len(inventario), dtype=bool)
+        for nome in COLUNAS_CUSTO:
+            mudou |= np.round(antes[nome], 2) != np.round(depois[nome], 2)
+        self.analisadas += len(linhas)
+        self.total_antes += float(antes['total'].sum())
+        self.total_depois += float(depois['total'].sum())
+        for i in np.flatnonzero(mudou):
+            linha = {**linhas[i], **{nome: float(depois[nome][i]) for nome in COLUNAS_CUSTO}}
+            self.alteradas.append(linha)
+            pessoa = self.por_pessoa.setdefault(linha.get('nome_pessoa'), [0, 0.0, 0.0])
+            pessoa[0] += 1
+            pessoa[1] += float(antes['total'][i])
+            pessoa[2] += float(depois['total'][i])
+        return self
+
+    @property
+    def diferenca(self):
+        return self.total_depois - self.total_antes
+
+    def resumo_por_pessoa(self):
+        """[{nome_pessoa, quantidade, total_antes, total_depois, diferenca}] das peças que mudam."""
+        return [{"nome_pessoa": nome, "quantidade": q, "total_antes": antes, "total_depois": depois,
+                 "diferenca": depois - antes}
+                for nome, (q, antes, depois) in sorted(self.por_pessoa.items(), key=lambda i: i[0] or "")]
+
+# --- Índice em memória para os filtros do relatório ---
+def ordinal_data(texto):
+    """Ordinal (date.toordinal) de uma data DD/MM/AAAA, ou None se o texto não for uma data válida."""
+    try:
+        return datetime.strptime(texto.strip(), "%d/%m/%Y").date().toordinal()
+    except (AttributeError, ValueError):
+        return None
+
+def mes_da_data(texto):
+    """Mês 'AAAA-MM' de uma data DD/MM/AAAA (ordena como texto), ou None se a data não for válida."""
+    return mes_do_ordinal(ordinal_data(texto))
+
+def mes_do_ordinal(ordinal):
+    """Como mes_da_data, a partir do ordinal já calculado por ordinal_data."""
+    return date.fromordinal(ordinal).strftime("%Y-%m") if ordinal else None
+
+class Agregados:
+    """Totais pré-agregados por (pessoa, mês de produção, tipo de peça): contagem e soma de cada custo.
+
+    Atualizados peça a peça em O(1); os resumos percorrem só as células (combinações distintas),
+    nunca as peças. Guarda a contribuição de cada peça para que remover subtraia exatamente o que
+    foi somado, mesmo que a peça tenha sido alterada entretanto.
+    """
+
+    DIMENSOES = ('nome_pessoa', 'mes', 'tipo_peca')
+
+    def __init__(self, pecas=()):
+        self.celulas = {}          # (pessoa, mes, tipo) -> [quantidade, argila, biscoito, esmalte, total]
+        self._contribuicoes = {}   # id -> (chave da célula, valores somados)
+        for peca in pecas:
+            self.adicionar(peca)
+
+    def __len__(self):
+        return len(self._contribuicoes)
+
+    def _somar(self, chave, valores, sinal):
+        celula = self.celulas.get(chave)
+        if celula is None:
+            celula = self.celulas[chave] = [0, 0.0, 0.0, 0.0, 0.0]
+        celula[0] += sinal
+        for i, valor in enumerate(valores, 1):
+            celula[i] += sinal * valor
+        if celula[0] == 0:
+            del self.celulas[chave]
+
+    def adicionar(self, peca):
+        """Soma a peça (se já lá estava, substitui a contribuição anterior)."""
+        self.adicionar_no_mes(peca, mes_da_data(peca.data_producao))
+
+    def adicionar_no_mes(self, peca, mes):
+        """Como adicionar, com o mês ('AAAA-MM' ou None) já calculado, para não voltar a interpretar a data."""
+        self.remover(peca.id)
+        chave = (peca.nome_pessoa, mes, peca.tipo_peca)
+        valores = (peca.custo_argila, peca.custo_biscoito, peca.custo_esmalte, peca.total)
+        self._contribuicoes[peca.id] = (chave, valores)
+        self._somar(chave, valores, 1)
+
+    def remover(self, peca_id):
+        contribuicao = self._contribuicoes.pop(peca_id, None)
+        if contribuicao is not None:
+            self._somar(*contribuicao, -1)
+
+    def resumo(self, agrupar=('nome_pessoa',), pessoas=None, mes_inicio=None, mes_fim=None, sem_data=False):
+        """Linhas {dimensões de `agrupar`, quantidade, custo_argila, custo_biscoito, custo_esmalte, total}.
+
+        Filtros como os do relatório, mas por meses inteiros ('AAAA-MM', inclusivos); com `sem_data`,
+        só as peças sem data de produção válida.
+        """
+        posicoes = [self.DIMENSOES.index(d) for d in agrupar]
+        grupos = {}
+        for chave, celula in self.celulas.items():
+            pessoa, mes, _ = chave
+            if pessoas and pessoa not in pessoas: continue
+            if sem_data:
+                if mes is not None: continue
+            elif mes_inicio or mes_fim:
+                if mes is None or (mes_inicio and mes < mes_inicio) or (mes_fim and mes > mes_fim): continue
+            soma = grupos.setdefault(tuple(chave[i] for i in posicoes), [0, 0.0, 0.0, 0.0, 0.0])
+            for i, valor in enumerate(celula):
+                soma[i] += valor
+        linhas = [{**dict(zip(agrupar, grupo)), "quantidade": q, "custo_argila": argila, "custo_biscoito": biscoito,
+                   "custo_esmalte": esmalte, "total": total}
+                  for grupo, (q, argila, biscoito, esmalte, total) in grupos.items()]
+        return sorted(linhas, key=lambda linha: tuple(linha[d] or "" for d in agrupar))
+
+class IndicePecas:
+    """Índice do inventário: pessoa -> ids e datas de produção ordenadas (para buscas por intervalo com bisect).
+
+    É atualizado peça a peça (adicionar/remover), nunca reconstruído, e mantém junto os Agregados
+    do inventário para os resumos e gráficos. Peças cuja data_producao
+    não está no formato DD/MM/AAAA ficam no grupo `sem_data` e só aparecem em filtros sem datas
+    ou quando esse grupo é pedido explicitamente.
+    """
+
+    def __init__(self, pecas=()):
+        self.pecas = {}        # id -> Peca
+        self.por_pessoa = {}   # nome_pessoa -> set de ids
+        self.sem_data = set()  # ids com data inválida
+        self._ordinais = {}    # id -> ordinal da data (ou None)
+        self._datas = []       # lista ordenada de (ordinal, id)
+        self.agregados = Agregados()
+        for peca in pecas:
+            self.adicionar(peca)
+
+    def __len__(self):
+        return len(self.pecas)
+
+    def __contains__(self, peca_id):
+        return peca_id in self.pecas
+
+    def adicionar(self, peca):
+        if peca.id in self.pecas:
+            self.remover(peca.id)
+        self.pecas[peca.id] = peca
+        ordinal = ordinal_data(peca.data_producao)
+        self.agregados.adicionar_no_mes(peca, mes_do_ordinal(ordinal))
+        self.por_pessoa.setdefault(peca.nome_pessoa, set()).add(peca.id)
+        self._ordinais[peca.id] = ordinal
+        if ordinal is None:
+            self.sem_data.add(peca.id)
+        else:
+            insort(self._datas, (ordinal, peca.id))
+
+    def remover(self, peca_id):
+        peca = self.pecas.pop(peca_id, None)
+        if peca is None: return None
+        self.agregados.remover(peca_id)
+        ids_pessoa = self.por_pessoa.get(peca.nome_pessoa)
+        if ids_pessoa is not None:
+            ids_pessoa.discard(peca_id)
+            if not ids_pessoa: del self.por_pessoa[peca.nome_pessoa]
+        ordinal = self._ordinais.pop(peca_id)
+        if ordinal is None:
+            self.sem_data.discard(peca_id)
+        else:
+            i = bisect_left(self._datas, (ordinal, peca_id))
+            if i < len(self._datas) and self._datas[i] == (ordinal, peca_id):
+                del self._datas[i]
+        return peca
+
+    def ordinal(self, peca):
+        """Ordinal da data de produção (None se inválida), sem voltar a interpretar o texto das peças indexadas."""
+        if peca.id in self._ordinais:
+            return self._ordinais[peca.id]
+        return ordinal_data(peca.data_producao)
+
+    def ids_por_pessoas(self, pessoas):
+        ids = set()
+        for pessoa in pessoas:
+            ids |= self.por_pessoa.get(pessoa, set())
+        return ids
+
+    def ids_no_intervalo(self, inicio=None, fim=None):
+        """Ids com data entre `inicio` e `fim` (objetos date, inclusivos), da data mais antiga para a mais recente."""
+        esquerda = 0 if inicio is None else bisect_left(self._datas, (inicio.toordinal(), ""))
+        direita = len(self._datas) if fim is None else bisect_right(self._datas, (fim.toordinal() + 1, ""))
+        return [peca_id for _, peca_id in self._datas[esquerda:direita]]
+
+    def consultar(self, pessoas=None, inicio=None, fim=None, sem_data=False):
+        """Peças que passam nos filtros, da data de produção mais recente para a mais antiga (sem data no fim)."""
+        if sem_data:
+            ids = list(self.sem_data)
+        elif inicio is not None or fim is not None:
+            ids = self.ids_no_intervalo(inicio, fim)[::-1]
+        else:
+            ids = self.ids_por_pessoas(pessoas) if pessoas else self.pecas.keys()
+            ids = sorted(ids, key=lambda peca_id: -(self._ordinais[peca_id] or 0))
+            pessoas = None
+        if pessoas:
+            ids_pessoas = self.ids_por_pessoas(pessoas)
+            ids = [peca_id for peca_id in ids if peca_id in ids_pessoas]
+        return [self.pecas[peca_id] for peca_id in ids]
@@ -0,0 +1,288 @@
+# --- Geração do relatório em PDF (sem Streamlit, importável pelos processos de trabalho) ---
+# A paginação é calculada antes de desenhar: cada peça ocupa um bloco de altura conhecida e nunca
+# é partida entre páginas. Relatórios com várias secções (grupos de PAGINAS_POR_SECAO páginas) são
+# desenhados em paralelo por processos separados e depois juntados num único PDF.
+import io
+import os
+import pickle
+import subprocess
+import sys
+import tempfile
+import threading
+import urllib.request
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
+from fpdf import FPDF
+from PIL import Image
+
+# Fotos no PDF: tamanho de impressão e resolução.
+LARGURA_FOTO_PDF_MM = 30
+ALTURA_FOTO_PDF_MM = 25
+DPI_FOTO_PDF = 150
+
+# Pré-carregamento das fotos: downloads em paralelo e limite da cache de fotos já reduzidas.
+MAX_DOWNLOADS_SIMULTANEOS = 8
+LIMITE_CACHE_FOTOS_BYTES = 32 * 1024 * 1024
+
+# Páginas desenhadas por cada processo de uma vez (limita as fotos em memória por secção).
+PAGINAS_POR_SECAO = 20
+
+ALTURA_LINHA_MM = 5
+LARGURA_TEXTO_MM = 160
+ESPACO_ENTRE_PECAS_MM = 3
+
+
+def para_rgb(img):
+    if img.mode in ("RGBA", "LA", "P"):
+        img = img.convert("RGBA")
+        fundo = Image.new("RGB", img.size, (255, 255, 255))
+        fundo.paste(img, mask=img.getchannel("A"))
+        return fundo
+    return img.convert("RGB") if img.mode != "RGB" else img
+
+
+def reduzir_foto(dados):
+    """Reduz uma imagem para o tamanho de impressão do PDF (JPEG em memória)."""
+    img = para_rgb(Image.open(io.BytesIO(dados)))
+    largura_px = round(LARGURA_FOTO_PDF_MM / 25.4 * DPI_FOTO_PDF)
+    altura_px = round(ALTURA_FOTO_PDF_MM / 25.4 * DPI_FOTO_PDF)
+    img.thumbnail((largura_px, altura_px), Image.LANCZOS)
+    buffer = io.BytesIO()
+    img.save(buffer, format="JPEG", quality=85)
+    return buffer.getvalue()
+
+
+def baixar_foto(url, medicoes=None):
+    """Descarrega a foto e reduz para o tamanho de impressão do PDF. Com `medicoes` (desempenho.Medicoes), cronometra os dois passos."""
+    medir = medicoes.medir if medicoes is not None else lambda *_: nullcontext({})
+    with medir("pdf", "baixar_foto") as medida:
+        with urllib.request.urlopen(url, timeout=20) as resposta:
+            dados = resposta.read()
+        medida["recebidos"] = len(dados)
+    with medir("pdf", "reduzir_foto"):
+        return reduzir_foto(dados)
+
+
+class CacheFotos:
+    """Cache LRU de fotos já reduzidas, limitado pelo total de bytes guardados."""
+
+    def __init__(self, limite_bytes):
+        self.limite_bytes = limite_bytes
+        self.total_bytes = 0
+        self._fotos = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, url):
+        with self._lock:
+            foto = self._fotos.get(url)
+            if foto is not None:
+                self._fotos.move_to_end(url)
+            return foto
+
+    def put(self, url, foto):
+        if len(foto) > self.limite_bytes: return
+        with self._lock:
+            anterior = self._fotos.pop(url, None)
+            if anterior is not None:
+                self.total_bytes -= len(anterior)
+            self._fotos[url] = foto
+            self.total_bytes += len(foto)
+            while self.total_bytes > self.limite_bytes:
+                _, removida = self._fotos.popitem(last=False)
+                self.total_bytes -= len(removida)
+
+
+def prefetch_fotos(pecas, url_da_foto, cache, medicoes=None, max_downloads=MAX_DOWNLOADS_SIMULTANEOS):
+    """Resolve os URLs com `url_da_foto(peca)` e descarrega em paralelo as fotos que faltam no `cache` (CacheFotos).
+
+    Devolve {peca.id: bytes reduzidos ou None}; uma foto que não se consiga descarregar fica a None.
+    """
+    urls = {peca.id: url_da_foto(peca) for peca in pecas}
+    fotos, em_falta = {}, set()
+    for url in set(u for u in urls.values() if u):
+        foto = cache.get(url)
+        if foto is None: em_falta.add(url)
+        else: fotos[url] = foto
+
+    def _baixar(url):
+        try:
+            return url, baixar_foto(url, medicoes)
+        except Exception as e:
+            print(f"Erro ao descarregar imagem para o PDF ({url}): {e}")
+            return url, None
+
+    if em_falta:
+        with ThreadPoolExecutor(max_workers=min(max_downloads, len(em_falta))) as executor:
+            for url, foto in executor.map(_baixar, em_falta):
+                fotos[url] = foto
+                if foto is not None: cache.put(url, foto)
+    return {peca_id: fotos.get(url) if url else None for peca_id, url in urls.items()}
+
+
+def _latin1(texto):
+    return texto.encode('latin-1', 'replace').decode('latin-1')
+
+
+def _dinheiro(valor):
+    return f"R$ {valor:.2f}".replace('.', ',')
+
+
+def _linhas_peca(peca):
+    """As quatro linhas de texto de uma peça, com o estilo de letra de cada uma."""
+    return [
+        ('B', f"Data Prod.: {peca.data_producao} | Pessoa: {peca.nome_pessoa} | Peca: {peca.tipo_peca}"),
+        ('', f"  Custos: Queima de biscoito({_dinheiro(peca.custo_biscoito)}), Queima de esmalte({_dinheiro(peca.custo_esmalte)}), Argila({_dinheiro(peca.custo_argila)})"),
+        ('', f"  >> Total da Peca: {_dinheiro(peca.total)}"),
+        ('', f"  (Registrado em: {peca.data_registro})"),
+    ]
+
+
+def _novo_pdf():
+    pdf = FPDF(orientation='P', unit='mm', format='A4')
+    pdf.set_auto_page_break(auto=True, margin=20)
+    return pdf
+
+
+def _titulo(pdf):
+    pdf.set_font('Arial', 'B', 16)
+    pdf.cell(0, 10, 'Relatorio de Producao do Atelie', ln=True, align='C'); pdf.ln(5)
+
+
+def _cabe_numa_linha(pdf, texto):
+    # Teste barato (só a largura do texto) antes do multi_cell, cuja quebra de linha é lenta.
+    return pdf.get_string_width(texto) <= LARGURA_TEXTO_MM - 2 * pdf.c_margin
+
+
+def _altura_peca(pdf, peca):
+    linhas = 0
+    for estilo, texto in _linhas_peca(peca):
+        pdf.set_font('Arial', estilo, 10)
+        texto = _latin1(texto)
+        if _cabe_numa_linha(pdf, texto):
+            linhas += 1
+        else:
+            linhas += len(pdf.multi_cell(LARGURA_TEXTO_MM, ALTURA_LINHA_MM, texto, dry_run=True, output="LINES"))
+    return max(linhas * ALTURA_LINHA_MM, ALTURA_FOTO_PDF_MM) + ESPACO_ENTRE_PECAS_MM
+
+
+def paginar(pecas):
+    """Distribui as peças por páginas A4 sem partir nenhuma. Devolve uma lista de páginas (listas de peças)."""
+    pdf = _novo_pdf()
+    pdf.add_page()
+    _titulo(pdf)
+    y, limite = pdf.get_y(), pdf.page_break_trigger
+    paginas, pagina = [], []
+    for peca in pecas:
+        altura = _altura_peca(pdf, peca)
+        if pagina and y + altura > limite:
+            paginas.append(pagina)
+            pagina, y = [], pdf.t_margin
+        pagina.append(peca)
+        y += altura
+    if pagina:
+        paginas.append(pagina)
+    return paginas
+
+
+def _desenhar_peca(pdf, peca, foto):
+    y_antes = pdf.get_y()
+    if foto:
+        try:
+            pdf.image(io.BytesIO(foto), x=170, y=y_antes, w=LARGURA_FOTO_PDF_MM, h=ALTURA_FOTO_PDF_MM)
+        except Exception as e: print(f"Erro ao adicionar imagem ao PDF: {e}")
+    for estilo, texto in _linhas_peca(peca):
+        pdf.set_font('Arial', estilo, 10)
+        texto = _latin1(texto)
+        if _cabe_numa_linha(pdf, texto):
+            pdf.cell(LARGURA_TEXTO_MM, ALTURA_LINHA_MM, texto, border=0, ln=True)
+        else:
+            pdf.multi_cell(LARGURA_TEXTO_MM, ALTURA_LINHA_MM, texto, border=0, ln=True)
+    pdf.set_y(max(pdf.get_y(), y_antes + ALTURA_FOTO_PDF_MM))
+    pdf.line(pdf.get_x(), pdf.get_y(), pdf.get_x() + 190, pdf.get_y()); pdf.ln(ESPACO_ENTRE_PECAS_MM)
+
+
+def _desenhar_resumo(pdf, resumo, total_pecas):
+    custo_geral_total = sum(linha["total"] for linha in resumo)
+    pdf.ln(10); pdf.set_font('Arial', 'B', 12); pdf.cell(0, 5, '--- RESUMO TOTAL ---', ln=True, align='C')
+    pdf.set_font('Arial', '', 10); pdf.cell(0, 5, f"Total de pecas: {total_pecas}", ln=True)
+    pdf.cell(0, 5, f"CUSTO GERAL TOTAL: {_dinheiro(custo_geral_total)}", ln=True); pdf.ln(5)
+    pdf.set_font('Arial', 'B', 12); pdf.cell(0, 5, '--- RESUMO POR PESSOA ---', ln=True, align='C')
+    pdf.set_font('Arial', '', 10)
+    for linha in resumo:
+        pdf.cell(0, 5, _latin1(f"  {linha['nome_pessoa']}: {_dinheiro(linha['total'])}"), ln=True)
+
+
+def gerar_secao(paginas, fotos, titulo=False, resumo=None, total_pecas=0):
+    """PDF (bytes) com estas páginas já distribuídas; `fotos` é {peca.id: bytes reduzidos}. Corre num processo à parte."""
+    pdf = _novo_pdf()
+    for i, pagina in enumerate(paginas):
+        pdf.add_page()
+        if titulo and i == 0:
+            _titulo(pdf)
+        for peca in pagina:
+            _desenhar_peca(pdf, peca, fotos.get(peca.id))
+    if resumo is not None:
+        _desenhar_resumo(pdf, resumo, total_pecas)
+    return bytes(pdf.output())
+
+
+def _gerar_secao_noutro_processo(*argumentos):
+    # Um interpretador novo que só importa este módulo (python -m relatorio_pdf). Os processos do
+    # multiprocessing ('spawn' e 'forkserver') voltam a executar o __main__ do processo pai, que no
+    # Streamlit é o script da app; 'fork' não é seguro com as threads da app (servidor, fila de gravação).
+    resultado = subprocess.run([sys.executable, "-m", "relatorio_pdf"], input=pickle.dumps(argumentos),
+                               capture_output=True, cwd=os.path.dirname(os.path.abspath(__file__)))
+    if resultado.returncode != 0:
+        raise RuntimeError(f"Erro ao gerar uma secção do PDF:\n{resultado.stderr.decode('utf-8', 'replace')[-2000:]}")
+    return resultado.stdout
+
+
+def gerar_relatorio(pecas, resumo, obter_fotos, saida, processos=None):
+    """Escreve o relatório completo no ficheiro binário `saida`.
+
+    `obter_fotos(pecas)` devolve {peca.id: bytes} e é chamado secção a secção no processo atual,
+    por isso só as fotos das secções em curso estão em memória. Com mais de uma secção, até
+    `processos` secções são desenhadas em paralelo; cada uma vai para um ficheiro temporário e
+    no fim são juntadas pela ordem certa.
+    """
+    paginas = paginar(pecas)
+    secoes = [paginas[i:i + PAGINAS_POR_SECAO] for i in range(0, len(paginas), PAGINAS_POR_SECAO)]
+    if len(secoes) <= 1:
+        saida.write(gerar_secao(paginas, obter_fotos(pecas), True, resumo, len(pecas)))
+        return
+
+    from pypdf import PdfWriter
+    processos = max(1, min(processos or os.cpu_count() or 1, len(secoes)))
+    with tempfile.TemporaryDirectory(prefix="relatorio_") as pasta:
+        caminhos = []
+
+        def _guardar(futuro):
+            caminho = os.path.join(pasta, f"secao_{len(caminhos):05d}.pdf")
+            with open(caminho, "wb") as ficheiro:
+                ficheiro.write(futuro.result())
+            caminhos.append(caminho)
+
+        # As threads só esperam pelos processos de cada secção (ver _gerar_secao_noutro_processo).
+        with ThreadPoolExecutor(max_workers=processos) as executor:
+            em_curso = deque()
+            for i, secao in enumerate(secoes):
+                ultima = i == len(secoes) - 1
+                fotos = obter_fotos([peca for pagina in secao for peca in pagina])
+                em_curso.append(executor.submit(_gerar_secao_noutro_processo, secao, fotos, i == 0,
+                                                resumo if ultima else None, len(pecas)))
+                del fotos
+                while len(em_curso) > processos:
+                    _guardar(em_curso.popleft())
+            while em_curso:
+                _guardar(em_curso.popleft())
+
+        escritor = PdfWriter()
+        for caminho in caminhos:
+            escritor.append(caminho)
+        escritor.write(saida)
+
+
+if __name__ == "__main__":
+    # Processo de trabalho de gerar_relatorio: argumentos de gerar_secao no stdin, PDF da secção no stdout.
+    sys.stdout.buffer.write(gerar_secao(*pickle.load(sys.stdin.buffer)))
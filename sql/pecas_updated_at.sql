@@ -0,0 +1,26 @@
+-- Coluna 'updated_at' de 'pecas' para a sincronização delta (correr no SQL Editor do projeto e depois
+-- voltar a correr relatorio_pecas.sql, para a view 'pecas_relatorio' incluir a coluna nova).
+-- A app só traz do servidor as linhas com 'updated_at' maior do que o último sync: com 'created_at'
+-- uma peça alterada (ex.: custos recalculados) noutro dispositivo nunca voltava a ser lida.
+alter table pecas add column if not exists updated_at timestamptz;
+update pecas set updated_at = created_at where updated_at is null;
+alter table pecas alter column updated_at set default now();
+alter table pecas alter column updated_at set not null;
+
+create index if not exists pecas_user_updated_at on pecas (user_id, updated_at);
+
+-- Qualquer update (incluindo o 'on conflict do update' dos upserts) marca a linha como alterada.
+create or replace function pecas_marcar_updated_at()
+returns trigger
+language plpgsql
+as $$
+begin
+    new.updated_at := now();
+    return new;
+end;
+$$;
+
+drop trigger if exists pecas_updated_at on pecas;
+create trigger pecas_updated_at
+    before update on pecas
+    for each row execute function pecas_marcar_updated_at();
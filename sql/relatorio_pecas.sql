@@ -0,0 +1,79 @@
+-- Consultas do relatório executadas no Supabase (correr no SQL Editor do projeto).
+-- As duas usam "security invoker", portanto as políticas RLS de 'pecas' continuam a valer:
+-- cada utilizador só vê e agrega as suas próprias peças.
+
+-- 'data_producao' é texto livre DD/MM/AAAA. Mesmas regras de modelo_atelie.ordinal_data (strptime
+-- '%d/%m/%Y'): dia e mês com 1 ou 2 dígitos, espaços à volta ignorados; datas impossíveis
+-- (ex.: 31/02/2024) dão null em vez de erro, para uma linha má não partir o relatório todo.
+-- Tem de ser 'immutable' para poder entrar no índice de expressão mais abaixo.
+create or replace function data_producao_valida(texto text)
+returns date
+language plpgsql
+immutable
+parallel safe
+as $$
+declare
+    partes text[];
+begin
+    partes := regexp_match(texto, '^\s*(\d{1,2})/(\d{1,2})/(\d{4})\s*$');
+    if partes is null then
+        return null;
+    end if;
+    return make_date(partes[3]::int, partes[2]::int, partes[1]::int);
+exception when others then
+    return null;
+end;
+$$;
+
+-- Filtros e ordenação por data do relatório (as políticas RLS juntam sempre o user_id): sem este
+-- índice, cada consulta à view calculava a data de todas as linhas do utilizador.
+create index if not exists pecas_user_data_producao_dia
+    on pecas (user_id, data_producao_valida(data_producao));
+
+-- A view expõe a data como date para filtros por intervalo. É recriada (e não só substituída)
+-- porque 'p.*' muda quando 'pecas' ganha colunas (ex.: pecas_updated_at.sql).
+drop view if exists pecas_relatorio;
+create view pecas_relatorio
+with (security_invoker = true) as
+select
+    p.*,
+    data_producao_valida(p.data_producao) as data_producao_dia
+from pecas p;
+
+-- Totais e contagens por pessoa para o filtro do relatório (parâmetros nulos = sem filtro).
+drop function if exists resumo_pecas_por_pessoa(text[], text, date, date);
+create or replace function resumo_pecas_por_pessoa(
+    p_pessoas text[] default null,
+    p_data text default null,
+    p_data_inicio date default null,
+    p_data_fim date default null,
+    p_sem_data boolean default false
+)
+returns table (
+    nome_pessoa text,
+    quantidade bigint,
+    custo_argila double precision,
+    custo_biscoito double precision,
+    custo_esmalte double precision,
+    total double precision
+)
+language sql
+stable
+security invoker
+as $$
+    select
+        r.nome_pessoa,
+        count(*) as quantidade,
+        coalesce(sum(r.custo_argila), 0)::double precision,
+        coalesce(sum(r.custo_biscoito), 0)::double precision,
+        coalesce(sum(r.custo_esmalte), 0)::double precision,
+        coalesce(sum(r.total), 0)::double precision
+    from pecas_relatorio r
+    where (p_pessoas is null or r.nome_pessoa = any(p_pessoas))
+      and (p_data is null or r.data_producao = p_data)
+      and (p_data_inicio is null or r.data_producao_dia >= p_data_inicio)
+      and (p_data_fim is null or r.data_producao_dia <= p_data_fim)
+      and (not p_sem_data or r.data_producao_dia is null)
+    group by r.nome_pessoa
+    order by r.nome_pessoa;
+$$;
@@ -0,0 +1,24 @@
+-- Versões da tabela de preços do ateliê (correr no SQL Editor do projeto).
+-- Cada versão vale para as peças produzidas a partir de 'vigente_desde'; antes da primeira versão
+-- valem os preços base de modelo_atelie.py. As versões são comuns a todos os utilizadores: todos as
+-- leem, mas só os administradores criam versões novas. Um utilizador passa a administrador com
+--   update auth.users set raw_app_meta_data = raw_app_meta_data || '{"role": "admin"}' where email = '...';
+-- (o app_metadata só o service role altera; vale a partir do próximo token do utilizador).
+create table if not exists tabelas_precos (
+    id uuid primary key default gen_random_uuid(),
+    vigente_desde date not null unique,
+    preco_biscoito_kg double precision not null check (preco_biscoito_kg >= 0),
+    preco_esmalte_cm3 double precision not null check (preco_esmalte_cm3 >= 0),
+    preco_argila_atelie_kg double precision not null check (preco_argila_atelie_kg >= 0),
+    created_at timestamptz not null default now()
+);
+
+alter table tabelas_precos enable row level security;
+
+drop policy if exists "tabelas_precos_ler" on tabelas_precos;
+create policy "tabelas_precos_ler" on tabelas_precos
+    for select to authenticated using (true);
+
+drop policy if exists "tabelas_precos_inserir" on tabelas_precos;
+create policy "tabelas_precos_inserir" on tabelas_precos
+    for insert to authenticated with check ((auth.jwt() -> 'app_metadata' ->> 'role') = 'admin');
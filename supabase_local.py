@@ -0,0 +1,429 @@
+# --- Substituto local (em memória) do Supabase ---
+# Implementa só o que a app usa: a tabela 'pecas' (e a view 'pecas_relatorio'), o RPC
+# 'resumo_pecas_por_pessoa', o bucket de fotos e o login por email/palavra-passe.
+# Como no Supabase com RLS, cada cliente só vê e altera as linhas do utilizador autenticado.
+# Ativa-se na app com ATELIE_BACKEND=local.
+import copy
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import quote, unquote
+from modelo_atelie import ordinal_data
+
+DURACAO_TOKEN_S = 3600
+# Tabelas sem user_id, iguais para todos os utilizadores autenticados (como uma política RLS 'using (true)').
+# Só quem tem app_metadata.role = PAPEL_ADMIN as pode alterar (ver sql/tabelas_precos.sql).
+TABELAS_PARTILHADAS = {'tabelas_precos'}
+PAPEL_ADMIN = 'admin'
+
+
+class ErroLocal(Exception):
+    pass
+
+
+class _Objeto:
+    """Imita os modelos pydantic do supabase-py: atributos e .dict()."""
+
+    def __init__(self, **campos):
+        self.__dict__.update(campos)
+
+    def dict(self):
+        return {k: v.dict() if isinstance(v, _Objeto) else v for k, v in self.__dict__.items()}
+
+
+class RespostaLocal:
+    def __init__(self, data, count=None):
+        self.data = data
+        self.count = count
+
+
+_PREFIXO_PUBLICO = "/storage/v1/object/public"
+
+
+class _PedidoFoto(BaseHTTPRequestHandler):
+    """GET de um URL público do bucket: serve o ficheiro guardado em ServidorLocal.ficheiros."""
+
+    def do_GET(self):
+        servidor = self.server.servidor
+        servidor.esperar()
+        chave = unquote(self.path[len(_PREFIXO_PUBLICO) + 1:]) if self.path.startswith(_PREFIXO_PUBLICO + "/") else None
+        with servidor.lock:
+            ficheiro = servidor.ficheiros.get(chave) if chave else None
+        if ficheiro is None:
+            self.send_error(404, "Object not found")
+            return
+        dados, tipo = ficheiro
+        self.send_response(200)
+        self.send_header("Content-Type", tipo)
+        self.send_header("Content-Length", str(len(dados)))
+        self.end_headers()
+        self.wfile.write(dados)
+
+    def log_message(self, *args):
+        pass
+
+
+class ServidorLocal:
+    """O "projeto Supabase" em memória, partilhado por todos os clientes.
+
+    `latencia` (segundos) é somada a cada pedido à base de dados ou ao storage, para simular a rede;
+    `pedidos` conta esses pedidos. Os URLs públicos das fotos apontam para um pequeno servidor HTTP
+    em 127.0.0.1 (arrancado no primeiro get_public_url), que também conta e espera cada download.
+    """
+
+    def __init__(self, latencia=0.0):
+        self.lock = threading.RLock()
+        self._http = None
+        self.reiniciar(latencia)
+
+    def reiniciar(self, latencia=0.0):
+        """Apaga todos os dados, utilizadores e tokens (ex.: entre cenários de benchmark ou testes)."""
+        with self.lock:
+            self.latencia = latencia
+            self.pedidos = 0
+            self.tabelas = {'pecas': {}, 'tabelas_precos': {}}  # nome -> {id: linha}
+            self.ficheiros = {}           # caminho no bucket -> (bytes, content-type)
+            self.utilizadores = {}        # email -> {"id", "email", "password", "app_metadata"}
+            self.tokens = {}              # access/refresh token -> id do utilizador
+            self._ultimo_carimbo = None
+
+    def inserir_direto(self, tabela, linhas):
+        """Insere linhas sem RLS nem latência (para preparar dados de teste), com 'created_at' crescente."""
+        with self.lock:
+            destino = self.tabelas.setdefault(tabela, {})
+            for linha in linhas:
+                carimbo = self._carimbo()
+                destino[linha['id']] = {**linha, 'created_at': carimbo, 'updated_at': carimbo}
+
+    def definir_papel(self, email, papel):
+        """Como editar app_metadata.role no painel do Supabase: vale a partir do próximo token do utilizador."""
+        with self.lock:
+            self.utilizadores[email]["app_metadata"] = {"role": papel} if papel else {}
+
+    def esperar(self):
+        """Um pedido pela "rede": conta-o e espera a latência configurada (fora do lock, como pedidos reais em paralelo)."""
+        with self.lock:
+            self.pedidos += 1
+        if self.latencia:
+            time.sleep(self.latencia)
+
+    def url_base_storage(self):
+        """http://127.0.0.1:<porta>/storage/v1/object/public, como o caminho dos URLs públicos do Supabase."""
+        with self.lock:
+            if self._http is None:
+                self._http = ThreadingHTTPServer(("127.0.0.1", 0), _PedidoFoto)
+                self._http.daemon_threads = True
+                self._http.servidor = self
+                threading.Thread(target=self._http.serve_forever, name="supabase-local-http", daemon=True).start()
+            return f"http://127.0.0.1:{self._http.server_address[1]}{_PREFIXO_PUBLICO}"
+
+    def _carimbo(self):
+        # Estritamente crescente, como 'created_at default now()' e o trigger de 'updated_at' com escritas sequenciais.
+        agora = datetime.now(timezone.utc)
+        if self._ultimo_carimbo and agora <= self._ultimo_carimbo:
+            agora = self._ultimo_carimbo + timedelta(microseconds=1)
+        self._ultimo_carimbo = agora
+        return agora.isoformat()
+
+    def linhas(self, tabela):
+        if tabela == 'pecas_relatorio':
+            linhas = []
+            for linha in self.tabelas['pecas'].values():
+                ordinal = ordinal_data(linha.get('data_producao'))
+                dia = datetime.fromordinal(ordinal).date().isoformat() if ordinal else None
+                linhas.append({**linha, 'data_producao_dia': dia})
+            return linhas
+        return list(self.tabelas.setdefault(tabela, {}).values())
+
+
+class ConsultaLocal:
+    """Construtor de consultas com a mesma interface encadeada do postgrest-py."""
+
+    def __init__(self, cliente, tabela):
+        self.cliente = cliente
+        self.tabela = tabela
+        self.operacao = 'select'
+        self.colunas = '*'
+        self.dados = None
+        self.filtros = []
+        self.ordem = []
+        self.intervalo = None
+
+    def select(self, colunas='*', **_):
+        self.operacao, self.colunas = 'select', colunas
+        return self
+
+    def insert(self, dados, **_):
+        self.operacao, self.dados = 'insert', dados
+        return self
+
+    def upsert(self, dados, **_):
+        self.operacao, self.dados = 'upsert', dados
+        return self
+
+    def update(self, dados, **_):
+        self.operacao, self.dados = 'update', dados
+        return self
+
+    def delete(self, **_):
+        self.operacao = 'delete'
+        return self
+
+    def _filtro(self, coluna, teste):
+        self.filtros.append(lambda linha: teste(linha.get(coluna)))
+        return self
+
+    def eq(self, coluna, valor):
+        return self._filtro(coluna, lambda v: v == valor)
+
+    def in_(self, coluna, valores):
+        valores = set(valores)
+        return self._filtro(coluna, lambda v: v in valores)
+
+    def gt(self, coluna, valor):
+        return self._filtro(coluna, lambda v: v is not None and v > valor)
+
+    def gte(self, coluna, valor):
+        return self._filtro(coluna, lambda v: v is not None and v >= valor)
+
+    def lt(self, coluna, valor):
+        return self._filtro(coluna, lambda v: v is not None and v < valor)
+
+    def lte(self, coluna, valor):
+        return self._filtro(coluna, lambda v: v is not None and v <= valor)
+
+    def is_(self, coluna, valor):
+        return self._filtro(coluna, lambda v: v is None if valor in (None, 'null') else v == valor)
+
+    def order(self, coluna, desc=False, nullsfirst=None, **_):
+        # Chamadas seguidas juntam critérios, como o 'order=a.desc,b.asc' do postgrest-py.
+        self.ordem.append((coluna, desc, desc if nullsfirst is None else nullsfirst))
+        return self
+
+    def range(self, inicio, fim):
+        self.intervalo = (inicio, fim)
+        return self
+
+    def limit(self, n):
+        self.intervalo = (0, n - 1)
+        return self
+
+    def execute(self):
+        return self.cliente._executar(self)
+
+
+class BucketLocal:
+    def __init__(self, cliente, nome):
+        self.cliente = cliente
+        self.nome = nome
+
+    def upload(self, path, file, file_options=None):
+        self.cliente._exigir_login()
+        servidor = self.cliente.servidor
+        servidor.esperar()
+        with servidor.lock:
+            chave = f"{self.nome}/{path}"
+            upsert = str((file_options or {}).get("upsert", "false")).lower() == "true"
+            if chave in servidor.ficheiros and not upsert:
+                raise ErroLocal(f"The resource already exists: {path}")
+            tipo = (file_options or {}).get("content-type", "application/octet-stream")
+            servidor.ficheiros[chave] = (bytes(file), tipo)
+        return _Objeto(path=path)
+
+    def remove(self, paths):
+        self.cliente._exigir_login()
+        servidor = self.cliente.servidor
+        servidor.esperar()
+        with servidor.lock:
+            return [{"name": p} for p in paths if servidor.ficheiros.pop(f"{self.nome}/{p}", None) is not None]
+
+    def download(self, path):
+        self.cliente.servidor.esperar()
+        ficheiro = self.cliente.servidor.ficheiros.get(f"{self.nome}/{path}")
+        if ficheiro is None:
+            raise ErroLocal(f"Object not found: {path}")
+        return ficheiro[0]
+
+    def get_public_url(self, path):
+        # Como no Supabase, o URL não confirma que o ficheiro existe: um ficheiro em falta dá 404 no download.
+        return f"{self.cliente.servidor.url_base_storage()}/{quote(f'{self.nome}/{path}')}"
+
+
+class StorageLocal:
+    def __init__(self, cliente):
+        self.cliente = cliente
+
+    def from_(self, nome):
+        return BucketLocal(self.cliente, nome)
+
+
+class AuthLocal:
+    def __init__(self, cliente):
+        self.cliente = cliente
+        self.sessao = None
+
+    def _nova_sessao(self, utilizador):
+        servidor = self.cliente.servidor
+        access_token, refresh_token = f"local-{uuid.uuid4()}", f"local-{uuid.uuid4()}"
+        servidor.tokens[access_token] = servidor.tokens[refresh_token] = utilizador["id"]
+        user = _Objeto(id=utilizador["id"], email=utilizador["email"],
+                       app_metadata=copy.deepcopy(utilizador.get("app_metadata", {})))
+        self.sessao = _Objeto(access_token=access_token, refresh_token=refresh_token, token_type="bearer",
+                              expires_in=DURACAO_TOKEN_S, expires_at=int(time.time()) + DURACAO_TOKEN_S, user=user)
+        return _Objeto(user=user, session=self.sessao)
+
+    def sign_up(self, credenciais):
+        servidor = self.cliente.servidor
+        with servidor.lock:
+            if credenciais["email"] in servidor.utilizadores:
+                raise ErroLocal("User already registered")
+            utilizador = {"id": str(uuid.uuid4()), "email": credenciais["email"], "password": credenciais["password"],
+                          "app_metadata": {}}
+            servidor.utilizadores[credenciais["email"]] = utilizador
+            return self._nova_sessao(utilizador)
+
+    def sign_in_with_password(self, credenciais):
+        utilizador = self.cliente.servidor.utilizadores.get(credenciais["email"])
+        if utilizador is None or utilizador["password"] != credenciais["password"]:
+            raise ErroLocal("Invalid login credentials")
+        return self._nova_sessao(utilizador)
+
+    def _utilizador_do_token(self, token):
+        user_id = self.cliente.servidor.tokens.get(token)
+        for utilizador in self.cliente.servidor.utilizadores.values():
+            if utilizador["id"] == user_id:
+                return utilizador
+        raise ErroLocal("JWT expired")
+
+    def set_session(self, access_token, refresh_token):
+        return self._nova_sessao(self._utilizador_do_token(refresh_token))
+
+    def refresh_session(self, refresh_token=None):
+        refresh_token = refresh_token or (self.sessao.refresh_token if self.sessao else None)
+        return self._nova_sessao(self._utilizador_do_token(refresh_token))
+
+    def get_session(self):
+        return self.sessao
+
+    def sign_out(self):
+        self.sessao = None
+
+
+class ClienteLocal:
+    """Cliente com a interface do supabase.Client usada pela app."""
+
+    def __init__(self, servidor):
+        self.servidor = servidor
+        self.auth = AuthLocal(self)
+        self.storage = StorageLocal(self)
+
+    def _exigir_login(self):
+        sessao = self.auth.sessao
+        if sessao is None or sessao.expires_at <= time.time():
+            raise ErroLocal("JWT expired")
+        return sessao.user.id
+
+    def table(self, nome):
+        return ConsultaLocal(self, nome)
+
+    def _executar(self, consulta):
+        user_id = self._exigir_login()
+        servidor = self.servidor
+        servidor.esperar()
+        with servidor.lock:
+            if consulta.operacao in ('insert', 'upsert'):
+                return RespostaLocal(self._gravar(consulta, user_id))
+            # RLS: só as linhas do próprio utilizador; as tabelas partilhadas não têm política de update/delete.
+            partilhada = consulta.tabela in TABELAS_PARTILHADAS
+            if partilhada and consulta.operacao in ('update', 'delete'):
+                return RespostaLocal([])
+            linhas = [l for l in servidor.linhas(consulta.tabela)
+                      if (partilhada or l.get('user_id') == user_id) and all(f(l) for f in consulta.filtros)]
+            if consulta.operacao == 'delete':
+                for linha in linhas:
+                    servidor.tabelas[consulta.tabela].pop(linha['id'], None)
+                return RespostaLocal(copy.deepcopy(linhas))
+            if consulta.operacao == 'update':
+                for linha in linhas:
+                    servidor.tabelas[consulta.tabela][linha['id']].update(consulta.dados, updated_at=servidor._carimbo())
+                return RespostaLocal([copy.deepcopy(servidor.tabelas[consulta.tabela][l['id']]) for l in linhas])
+            # Sorts estáveis do último critério para o primeiro. Sem 'nullsfirst', os nulos vêm no fim em
+            # ordem ascendente e no início em descendente, como no Postgres.
+            for coluna, desc, nulos_primeiro in reversed(consulta.ordem):
+                com_valor = sorted((l for l in linhas if l.get(coluna) is not None), key=lambda l: l[coluna], reverse=desc)
+                nulos = [l for l in linhas if l.get(coluna) is None]
+                linhas = nulos + com_valor if nulos_primeiro else com_valor + nulos
+            if consulta.intervalo:
+                inicio, fim = consulta.intervalo
+                linhas = linhas[inicio:fim + 1]
+            if consulta.colunas != '*':
+                colunas = [c.strip() for c in consulta.colunas.split(',')]
+                linhas = [{c: l.get(c) for c in colunas} for l in linhas]
+            return RespostaLocal(copy.deepcopy(linhas))
+
+    def _gravar(self, consulta, user_id):
+        tabela = self.servidor.tabelas.setdefault(consulta.tabela, {})
+        linhas = consulta.dados if isinstance(consulta.dados, list) else [consulta.dados]
+        if consulta.tabela in TABELAS_PARTILHADAS:
+            if self.auth.sessao.user.app_metadata.get('role') != PAPEL_ADMIN:
+                raise ErroLocal(f'new row violates row-level security policy for table "{consulta.tabela}"')
+            linhas = [{'id': str(uuid.uuid4()), **linha} for linha in linhas]
+        for linha in linhas:
+            if consulta.tabela not in TABELAS_PARTILHADAS and linha.get('user_id') != user_id:
+                raise ErroLocal('new row violates row-level security policy for table "pecas"')
+            if consulta.operacao == 'insert' and linha['id'] in tabela:
+                raise ErroLocal('duplicate key value violates unique constraint "pecas_pkey"')
+        gravadas = []
+        for linha in linhas:
+            anterior = tabela.get(linha['id'])
+            nova = {**(anterior or {}), **copy.deepcopy(linha)}
+            nova['updated_at'] = self.servidor._carimbo()
+            nova['created_at'] = anterior['created_at'] if anterior else nova['updated_at']
+            tabela[linha['id']] = nova
+            gravadas.append(copy.deepcopy(nova))
+        return gravadas
+
+    def rpc(self, nome, params=None):
+        if nome != 'resumo_pecas_por_pessoa':
+            raise ErroLocal(f"Could not find the function public.{nome}")
+        return _RpcLocal(self, params or {})
+
+
+class _RpcLocal:
+    def __init__(self, cliente, params):
+        self.cliente = cliente
+        self.params = params
+
+    def execute(self):
+        # Mesma lógica do SQL em sql/relatorio_pecas.sql.
+        p = self.params
+        consulta = self.cliente.table('pecas_relatorio').select('*')
+        if p.get('p_pessoas'): consulta.in_('nome_pessoa', p['p_pessoas'])
+        if p.get('p_data'): consulta.eq('data_producao', p['p_data'])
+        if p.get('p_data_inicio'): consulta.gte('data_producao_dia', p['p_data_inicio'])
+        if p.get('p_data_fim'): consulta.lte('data_producao_dia', p['p_data_fim'])
+        if p.get('p_sem_data'): consulta.is_('data_producao_dia', 'null')
+        resumo = {}
+        for linha in consulta.execute().data:
+            r = resumo.setdefault(linha['nome_pessoa'], {
+                "nome_pessoa": linha['nome_pessoa'], "quantidade": 0, "custo_argila": 0.0,
+                "custo_biscoito": 0.0, "custo_esmalte": 0.0, "total": 0.0})
+            r["quantidade"] += 1
+            for coluna in ("custo_argila", "custo_biscoito", "custo_esmalte", "total"):
+                r[coluna] += float(linha.get(coluna) or 0)
+        return RespostaLocal(sorted(resumo.values(), key=lambda r: r["nome_pessoa"] or ""))
+
+
+_servidor_partilhado = None
+
+def servidor_partilhado():
+    """O servidor usado pela app com ATELIE_BACKEND=local (um por processo; os benchmarks preenchem-no antes)."""
+    global _servidor_partilhado
+    if _servidor_partilhado is None:
+        _servidor_partilhado = ServidorLocal()
+    return _servidor_partilhado
+
+def create_client(servidor=None):
+    return ClienteLocal(servidor or ServidorLocal())
@@ -0,0 +1,84 @@
+# Preparação comum dos testes: a raiz do repositório no sys.path, o substituto local do Supabase
+# (supabase_local.py) e a app a correr com streamlit.testing sobre ele.
+import io
+import os
+import sys
+import time
+
+import pytest
+from PIL import Image
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+import streamlit as st
+from streamlit.testing.v1 import AppTest
+import gravacao_atelie
+import supabase_local
+from cache_local import CacheLocal
+
+SCRIPT_APP = os.path.join(RAIZ, "app_final_atelie.py")
+
+
+@pytest.fixture
+def esperar():
+    """esperar(condicao, limite=10): repete a condição até ser verdadeira; False se o limite (s) passar."""
+    def _esperar(condicao, limite=10):
+        fim = time.monotonic() + limite
+        while not condicao():
+            if time.monotonic() > fim: return False
+            time.sleep(0.01)
+        return True
+    return _esperar
+
+
+@pytest.fixture
+def foto():
+    """Uma foto PNG de 640x480."""
+    buffer = io.BytesIO()
+    Image.new("RGB", (640, 480), (200, 120, 40)).save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+# --- Substituto local do Supabase, sem a app ---
+@pytest.fixture
+def servidor():
+    return supabase_local.ServidorLocal()
+
+
+@pytest.fixture
+def cliente(servidor, monkeypatch):
+    """Cliente com sessão iniciada por um utilizador novo; a fila de gravação tenta de novo sem esperar segundos."""
+    monkeypatch.setattr(gravacao_atelie, "ESPERA_BASE_GRAVACAO", 0.01)
+    cliente = supabase_local.create_client(servidor)
+    cliente.auth.sign_up({"email": "dono@atelie.test", "password": "x"})
+    return cliente
+
+
+# --- A app (app_final_atelie.py) com streamlit.testing ---
+@pytest.fixture
+def ambiente(tmp_path, monkeypatch):
+    """Servidor partilhado limpo, um utilizador novo e uma cache SQLite vazia só deste teste.
+    Devolve (servidor, cache, resposta do sign_up)."""
+    caminho = str(tmp_path / "cache.sqlite3")
+    monkeypatch.setenv("ATELIE_BACKEND", "local")
+    monkeypatch.setenv("ATELIE_CACHE_LOCAL", caminho)
+    monkeypatch.setenv("ATELIE_LOG_DESEMPENHO", os.devnull)
+    st.cache_resource.clear()  # get_cache_local guarda o caminho da cache do teste anterior
+    servidor = supabase_local.servidor_partilhado()
+    servidor.reiniciar()
+    resposta = supabase_local.create_client(servidor).auth.sign_up({"email": "dono@atelie.test", "password": "x"})
+    return servidor, CacheLocal(caminho), resposta
+
+
+@pytest.fixture
+def abrir_app(ambiente):
+    """abrir_app(): um AppTest do script, já com a sessão do utilizador de `ambiente` (ainda por correr)."""
+    resposta = ambiente[2]
+
+    def _abrir():
+        at = AppTest.from_file(SCRIPT_APP, default_timeout=60)
+        at.session_state.user = resposta.user.dict()
+        at.session_state.session = resposta.session.dict()
+        return at
+    return _abrir
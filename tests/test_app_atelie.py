@@ -0,0 +1,513 @@
+# A app de ponta a ponta: o script Streamlit corre com streamlit.testing sobre o substituto em memória
+# (supabase_local.py). Arranque a partir da cópia local (SQLite) e reconciliação com o Supabase.
+import io
+import time
+from datetime import date
+
+from pypdf import PdfReader
+
+import gravacao_atelie
+import relatorio_pdf
+import supabase_local
+from modelo_atelie import Agregados, Peca
+
+
+def _linha(user_id, pessoa):
+    return Peca("10/03/2024", pessoa, "Vaso", 1.0, 10, 10, 10, user_id=user_id).to_dict()
+
+
+def test_arranque_da_cache_reconcilia_com_o_servidor(ambiente, abrir_app, esperar):
+    servidor, cache, resposta = ambiente
+    user_id = resposta.user.id
+    a, c, d = (_linha(user_id, p) for p in ("Ana", "Caio", "Duda"))
+    servidor.inserir_direto('pecas', [a, c, d])
+    no_servidor = servidor.tabelas['pecas']
+    # Cópia local: A e C como no servidor; B já foi apagada noutro dispositivo; D existe no servidor mas
+    # falta na cópia local e o 'ultimo_sync' guardado já passou por ela (o sync delta não a traz).
+    b = {**_linha(user_id, "Bia"), 'created_at': "9999-12-31T00:00:00+00:00", 'updated_at': "9999-12-31T00:00:00+00:00"}
+    cache.guardar(user_id, [no_servidor[a['id']], b, no_servidor[c['id']]])
+    cache.set_meta(user_id, "ultimo_sync", no_servidor[d['id']]['updated_at'])
+    pendente = _linha(user_id, "Edu")  # criada offline, ainda por gravar
+    cache.adicionar_pendente(user_id, pendente, None)
+
+    at = abrir_app()
+    at.run()
+
+    assert not at.exception
+    assert {p.id for p in at.session_state.inventario} == {a['id'], c['id'], d['id'], pendente['id']}
+    assert {l['id'] for l in cache.carregar(user_id)} >= {a['id'], c['id'], d['id']}
+    assert b['id'] not in {l['id'] for l in cache.carregar(user_id)}
+    # A peça pendente voltou à fila e foi gravada; sai dos pendentes da cache.
+    assert esperar(lambda: pendente['id'] in no_servidor)
+    assert esperar(lambda: not cache.listar_pendentes(user_id))
+
+
+def test_sync_delta_traz_pecas_alteradas_noutro_dispositivo(ambiente, abrir_app):
+    servidor, cache, resposta = ambiente
+    user_id = resposta.user.id
+    a, c = _linha(user_id, "Ana"), _linha(user_id, "Caio")
+    servidor.inserir_direto('pecas', [a, c])
+    cache.guardar(user_id, list(servidor.tabelas['pecas'].values()))
+    cache.set_meta(user_id, "ultimo_sync", servidor.tabelas['pecas'][c['id']]['updated_at'])
+    # Outro dispositivo recalcula o custo de A: o 'created_at' fica igual, o 'updated_at' avança.
+    outro = supabase_local.create_client(servidor)
+    outro.auth.sign_in_with_password({"email": "dono@atelie.test", "password": "x"})
+    outro.table('pecas').update({'total': 123.45}).eq('id', a['id']).execute()
+
+    at = abrir_app()
+    at.run()
+
+    assert not at.exception
+    assert [p.id for p in at.session_state.inventario] == [c['id'], a['id']]
+    assert at.session_state.indice.pecas[a['id']].total == 123.45
+    assert at.session_state.inventario[1].total == 123.45
+    assert next(l for l in cache.carregar(user_id) if l['id'] == a['id'])['total'] == 123.45
+
+
+def test_linhas_gravadas_na_cache_nao_avancam_o_ultimo_sync(ambiente, abrir_app):
+    servidor, cache, resposta = ambiente
+    user_id = resposta.user.id
+    a, c = _linha(user_id, "Ana"), _linha(user_id, "Caio")
+    servidor.inserir_direto('pecas', [a, c])
+    no_servidor = servidor.tabelas['pecas']
+    cache.guardar(user_id, [no_servidor[a['id']], no_servidor[c['id']]])
+    cache.set_meta(user_id, "ultimo_sync", no_servidor[c['id']]['updated_at'])
+    outro = supabase_local.create_client(servidor)
+    outro.auth.sign_in_with_password({"email": "dono@atelie.test", "password": "x"})
+    outro.table('pecas').update({'total': 999.0}).eq('id', c['id']).execute()
+    # Depois disso, uma peça nova é gravada e a linha do servidor vai para a cache, como na FilaGravacao:
+    # o seu 'updated_at' é mais recente do que a alteração de C, que este dispositivo ainda não viu.
+    e = _linha(user_id, "Edu")
+    cache.guardar(user_id, outro.table('pecas').upsert(e).execute().data)
+
+    at = abrir_app()
+    at.run()
+
+    assert not at.exception
+    assert at.session_state.indice.pecas[c['id']].total == 999.0
+    assert cache.get_meta(user_id, "ultimo_sync") == no_servidor[e['id']]['updated_at']
+
+
+def test_sem_rede_fica_a_copia_local(ambiente, abrir_app, monkeypatch):
+    servidor, cache, resposta = ambiente
+    user_id = resposta.user.id
+    linha = _linha(user_id, "Ana")
+    servidor.inserir_direto('pecas', [linha])
+    cache.guardar(user_id, [servidor.tabelas['pecas'][linha['id']]])
+
+    def _offline(*args, **kwargs):
+        raise ConnectionError("sem rede")
+    monkeypatch.setattr(servidor, "esperar", _offline)
+    at = abrir_app()
+    at.run()
+
+    assert not at.exception
+    assert [p.id for p in at.session_state.inventario] == [linha['id']]
+    assert any("Sem ligação" in w.value for w in at.warning)
+
+
+# --- Sessão: renovação do token ---
+def test_sessao_perto_de_expirar_e_renovada_antes_dos_pedidos(ambiente, abrir_app):
+    servidor, cache, resposta = ambiente
+    servidor.inserir_direto('pecas', [_linha(resposta.user.id, "Ana")])
+    at = abrir_app()
+    at.session_state.session = {**resposta.session.dict(), 'expires_at': int(time.time()) + 60}
+    at.run()
+
+    assert not at.exception
+    assert at.session_state.session['access_token'] != resposta.session.access_token
+    assert at.session_state.session['expires_at'] > time.time() + 3000
+    assert len(at.session_state.inventario) == 1
+
+
+def test_jwt_expirado_renova_e_repete_o_pedido(ambiente, abrir_app, monkeypatch):
+    servidor, cache, resposta = ambiente
+    servidor.inserir_direto('pecas', [_linha(resposta.user.id, "Ana")])
+    exigir_login, recusados = supabase_local.ClienteLocal._exigir_login, []
+
+    def _expira_uma_vez(self):
+        if not recusados:  # o token anexado deixa de valer no servidor antes do primeiro pedido
+            recusados.append(self.auth.sessao.access_token)
+            raise supabase_local.ErroLocal("JWT expired")
+        return exigir_login(self)
+    monkeypatch.setattr(supabase_local.ClienteLocal, "_exigir_login", _expira_uma_vez)
+    at = abrir_app()
+    at.run()
+
+    assert not at.exception
+    assert at.session_state.user is not None
+    assert len(at.session_state.inventario) == 1
+    assert at.session_state.session['access_token'] not in recusados
+
+
+def test_sessao_que_nao_renova_volta_ao_login(ambiente, abrir_app, monkeypatch):
+    servidor, cache, resposta = ambiente
+    servidor.inserir_direto('pecas', [_linha(resposta.user.id, "Ana")])
+
+    def _recusa(self):
+        raise supabase_local.ErroLocal("JWT expired")
+    monkeypatch.setattr(supabase_local.ClienteLocal, "_exigir_login", _recusa)
+    at = abrir_app()
+    at.run()
+
+    assert not at.exception
+    assert at.session_state.user is None and at.session_state.session is None
+    assert "A sua sessão expirou. Por favor, entre novamente." in [w.value for w in at.warning]
+
+
+# --- Carga inicial por páginas ---
+def _paginas_da_carga(monkeypatch):
+    """Intervalos pedidos pela carga inicial: selects de linhas inteiras de 'pecas' sem filtros (o sync delta
+    filtra por updated_at e a reconciliação só pede ids)."""
+    intervalos = []
+    executar = supabase_local.ClienteLocal._executar
+
+    def _executar(self, consulta):
+        if consulta.tabela == 'pecas' and consulta.operacao == 'select' and consulta.colunas == '*' and not consulta.filtros:
+            intervalos.append(consulta.intervalo)
+        return executar(self, consulta)
+    monkeypatch.setattr(supabase_local.ClienteLocal, "_executar", _executar)
+    return intervalos
+
+
+def test_carga_inicial_por_paginas(ambiente, abrir_app, monkeypatch):
+    servidor, cache, resposta = ambiente
+    user_id = resposta.user.id
+    linhas = [_linha(user_id, f"Pessoa {i}") for i in range(1001)]
+    servidor.inserir_direto('pecas', linhas)
+    intervalos = _paginas_da_carga(monkeypatch)
+
+    at = abrir_app()
+    at.run()
+
+    assert not at.exception
+    assert intervalos == [(0, 499), (500, 999), (1000, 1499)]
+    assert at.session_state.carga_offset is None
+    # Das mais recentes para as mais antigas, sem repetidas.
+    assert [p.id for p in at.session_state.inventario] == [l['id'] for l in reversed(linhas)]
+    assert cache.get_meta(user_id, "carga_offset") is None
+    assert len(cache.carregar(user_id)) == 1001
+
+
+def test_carga_inicial_interrompida_continua_de_onde_ficou(ambiente, abrir_app, monkeypatch):
+    servidor, cache, resposta = ambiente
+    user_id = resposta.user.id
+    linhas = [_linha(user_id, f"Pessoa {i}") for i in range(1001)]
+    servidor.inserir_direto('pecas', linhas)
+    # A sessão anterior só gravou na cache a primeira página antes de fechar.
+    cache.guardar(user_id, [servidor.tabelas['pecas'][l['id']] for l in reversed(linhas[-500:])])
+    cache.set_meta(user_id, "carga_offset", 500)
+    cache.set_meta(user_id, "ultimo_sync", servidor.tabelas['pecas'][linhas[-1]['id']]['updated_at'])
+    intervalos = _paginas_da_carga(monkeypatch)
+
+    at = abrir_app()
+    at.run()
+
+    assert not at.exception
+    assert intervalos == [(500, 999), (1000, 1499)]
+    assert [p.id for p in at.session_state.inventario] == [l['id'] for l in reversed(linhas)]
+    assert cache.get_meta(user_id, "carga_offset") is None
+    assert len(cache.carregar(user_id)) == 1001
+
+
+def test_relatorio_a_meio_da_carga_sem_rede(ambiente, abrir_app, monkeypatch):
+    servidor, cache, resposta = ambiente
+    user_id = resposta.user.id
+    linha = _linha(user_id, "Ana")
+    servidor.inserir_direto('pecas', [linha])
+    cache.guardar(user_id, [servidor.tabelas['pecas'][linha['id']]])
+    cache.set_meta(user_id, "carga_offset", 500)  # a carga inicial ficou a meio
+
+    def _offline(*args, **kwargs):
+        raise ConnectionError("sem rede")
+    monkeypatch.setattr(servidor, "esperar", _offline)
+    at = abrir_app()
+    at.session_state["menu_radio"] = "Ver Relatório Completo"
+    at.run()
+
+    assert not at.exception
+    assert at.multiselect[0].options == ["Ana"]
+    assert any(s.value == "Exibindo 1 Peças" for s in at.subheader)
+
+
+
+def test_relatorio_durante_a_carga_pede_so_a_pagina_e_os_totais(ambiente, abrir_app, monkeypatch):
+    servidor, cache, resposta = ambiente
+    user_id = resposta.user.id
+    linhas = []
+    for i in range(40):
+        # Datas repetidas (o desempate é o created_at) e algumas inválidas, que ficam no fim.
+        data = "sem data" if i % 2 == 0 else f"{i % 7 + 1:02d}/03/2024"
+        linhas.append(Peca(data, f"Pessoa {i}", "Vaso", 1.0, 10, 10, 10, user_id=user_id).to_dict())
+    servidor.inserir_direto('pecas', linhas)
+    cache.guardar(user_id, [servidor.tabelas['pecas'][linhas[-1]['id']]])
+    cache.set_meta(user_id, "carga_offset", 1)  # só a peça mais recente chegou antes de a carga parar
+
+    consultas, paginas = [], []
+    executar = supabase_local.ClienteLocal._executar
+
+    def _executar(self, consulta):
+        resposta = executar(self, consulta)
+        if consulta.operacao == 'select' and consulta.intervalo:  # as leituras do RPC local contam-se à parte
+            consultas.append((consulta.tabela, consulta.intervalo))
+            if consulta.tabela == 'pecas_relatorio':
+                paginas.append([linha['nome_pessoa'] for linha in resposta.data])
+        return resposta
+    monkeypatch.setattr(supabase_local.ClienteLocal, "_executar", _executar)
+    rpc = []
+    monkeypatch.setattr(supabase_local._RpcLocal, "execute",
+                        lambda self, execute=supabase_local._RpcLocal.execute: rpc.append(self.params) or execute(self))
+    at = abrir_app()
+    at.session_state["menu_radio"] = "Ver Relatório Completo"
+    at.run()
+
+    assert not at.exception
+    # Com a carga a meio: os totais pelo RPC e só as 25 peças da primeira página, em vez de todas as do filtro.
+    assert len(rpc) == 2  # nomes para o filtro por pessoa e totais do filtro
+    assert consultas[:2] == [('pecas_relatorio', (0, 24)), ('pecas', (1, 500))]  # a página, depois o resto da carga
+    assert [c for c in consultas if c[0] == 'pecas_relatorio'] == [('pecas_relatorio', (0, 24))]
+    # Depois da carga, a mesma página sai do índice local, pela mesma ordem.
+    assert at.session_state.carga_offset is None
+    assert any(s.value == "Exibindo 40 Peças" for s in at.subheader)
+    mostradas = [m.value.split("**Pessoa:** ")[1].split(" |")[0] for m in at.markdown if "**Pessoa:**" in m.value]
+    assert mostradas == paginas[0]
+
+
+
+# --- Resumos do relatório ---
+def _resumo_por_pessoa(at):
+    tabela = at.dataframe[0].value
+    return dict(zip(tabela["Pessoa"], tabela["Peças"]))
+
+
+def test_resumo_de_meses_inteiros_vem_dos_agregados_e_o_resto_das_pecas(ambiente, abrir_app, monkeypatch):
+    servidor, cache, resposta = ambiente
+    user_id = resposta.user.id
+    servidor.inserir_direto('pecas', [
+        Peca(data, pessoa, "Vaso", 1.0, 10, 10, 10, user_id=user_id).to_dict()
+        for data, pessoa in (("05/03/2024", "Ana"), ("31/03/2024", "Ana"), ("01/03/2024", "Bia"),
+                             ("15/02/2024", "Bia"), ("sem data", "Caio"), ("01/04/2024", "Caio"))])
+    chamadas = []
+    resumo = Agregados.resumo
+
+    def _resumo(self, agrupar=('nome_pessoa',), pessoas=None, mes_inicio=None, mes_fim=None, sem_data=False):
+        chamadas.append((agrupar, mes_inicio, mes_fim))
+        return resumo(self, agrupar, pessoas, mes_inicio, mes_fim, sem_data)
+    monkeypatch.setattr(Agregados, "resumo", _resumo)
+    at = abrir_app()
+    at.session_state["menu_radio"] = "Ver Relatório Completo"
+    at.run()
+    assert _resumo_por_pessoa(at) == {"Ana": 2, "Bia": 2, "Caio": 2}
+
+    # Um mês inteiro: os totais por pessoa, mês e tipo saem dos agregados do índice, já filtrados por mês.
+    chamadas.clear()
+    next(s for s in at.selectbox if s.label == "Filtrar por Data de Produção:").set_value("Mês").run()
+    next(n for n in at.number_input if n.label == "Mês:").set_value(3).run()
+    next(n for n in at.number_input if n.label == "Ano:").set_value(2024).run()
+    assert not at.exception
+    assert _resumo_por_pessoa(at) == {"Ana": 2, "Bia": 1}
+    assert any(s.value == "Exibindo 3 Peças" for s in at.subheader)
+    assert set(chamadas) >= {
+        (('nome_pessoa',), "2024-03", "2024-03"), (('mes',), "2024-03", "2024-03"), (('tipo_peca',), "2024-03", "2024-03")}
+
+    # Um intervalo que corta o mês: agrega as peças do filtro (sem meses nos agregados).
+    chamadas.clear()
+    next(s for s in at.selectbox if s.label == "Filtrar por Data de Produção:").set_value("Intervalo").run()
+    next(d for d in at.date_input if d.label == "De:").set_value(date(2024, 3, 2)).run()
+    next(d for d in at.date_input if d.label == "Até:").set_value(date(2024, 3, 31)).run()
+    assert not at.exception
+    assert _resumo_por_pessoa(at) == {"Ana": 2}
+    assert chamadas and all(inicio is None and fim is None for _, inicio, fim in chamadas)
+
+
+
+# --- Vista paginada do relatório ---
+def _legenda_da_pagina(at):
+    return next(c.value for c in at.caption if c.value.startswith("Página "))
+
+
+def test_pagina_do_relatorio_volta_ao_inicio_quando_a_vista_muda(ambiente, abrir_app):
+    servidor, cache, resposta = ambiente
+    servidor.inserir_direto('pecas', [_linha(resposta.user.id, f"Pessoa {i % 3}") for i in range(60)])
+    at = abrir_app()
+    at.session_state["menu_radio"] = "Ver Relatório Completo"
+    at.run()
+    assert _legenda_da_pagina(at) == "Página 1 de 3 — peças 1 a 25 de 60."
+    at.number_input(key="pagina_relatorio").set_value(3).run()
+    assert _legenda_da_pagina(at) == "Página 3 de 3 — peças 51 a 60 de 60."
+
+    # Filtro novo: a página 3 deixava de existir (e de fazer sentido) para só 20 peças.
+    at.multiselect[0].set_value(["Pessoa 0"]).run()
+    assert not at.exception
+    assert _legenda_da_pagina(at) == "Página 1 de 1 — peças 1 a 20 de 20."
+
+    at.multiselect[0].set_value([]).run()
+    at.number_input(key="pagina_relatorio").set_value(2).run()
+    next(s for s in at.selectbox if s.label == "Ordenar por:").set_value("Custo total (maior)").run()
+    assert _legenda_da_pagina(at) == "Página 1 de 3 — peças 1 a 25 de 60."
+
+
+def test_voltar_ao_relatorio_recomeca_na_primeira_pagina(ambiente, abrir_app):
+    # Regressão: fora do relatório o Streamlit apaga a chave do widget da página, mas a vista (filtro,
+    # ordem, tamanho) fica igual; ler a página ao voltar dava erro.
+    servidor, cache, resposta = ambiente
+    servidor.inserir_direto('pecas', [_linha(resposta.user.id, f"Pessoa {i % 3}") for i in range(60)])
+    at = abrir_app()
+    at.session_state["menu_radio"] = "Ver Relatório Completo"
+    at.run()
+    at.number_input(key="pagina_relatorio").set_value(2).run()
+    at.radio(key="menu_radio").set_value("Excluir Peça").run()
+    at.radio(key="menu_radio").set_value("Ver Relatório Completo").run()
+
+    assert not at.exception
+    assert _legenda_da_pagina(at) == "Página 1 de 3 — peças 1 a 25 de 60."
+
+
+
+# --- PDF do relatório ---
+def _preparar_pdf(at):
+    """Clica em "Preparar Relatório em PDF"; False se o botão não estiver (o PDF do filtro já está em cache)."""
+    botao = next((b for b in at.button if b.label == "Preparar Relatório em PDF"), None)
+    if botao is None: return False
+    botao.click().run()
+    return True
+
+
+def _pessoas_no_pdf(at):
+    [pdf_bytes] = at.session_state.relatorio_cache.values()
+    texto = "".join(folha.extract_text() for folha in PdfReader(io.BytesIO(pdf_bytes)).pages)
+    return {nome for nome in ("Ana", "Bia", "Caio") if f"Pessoa: {nome}" in texto}
+
+
+def test_pdf_fica_em_cache_ate_o_filtro_ou_o_inventario_mudarem(ambiente, abrir_app, monkeypatch):
+    servidor, cache, resposta = ambiente
+    linhas = [_linha(resposta.user.id, nome) for nome in ("Ana", "Bia", "Caio")]
+    servidor.inserir_direto('pecas', linhas)
+    gerados = []
+    gerar = relatorio_pdf.gerar_relatorio
+    monkeypatch.setattr(relatorio_pdf, "gerar_relatorio", lambda *args, **kwargs: gerados.append(1) or gerar(*args, **kwargs))
+    at = abrir_app()
+    at.session_state["menu_radio"] = "Ver Relatório Completo"
+    at.run()
+
+    assert _preparar_pdf(at)
+    assert len(gerados) == 1 and _pessoas_no_pdf(at) == {"Ana", "Bia", "Caio"}
+    at.run()
+    assert not _preparar_pdf(at) and len(gerados) == 1
+
+    # Outro filtro: outro PDF, e só o último fica guardado.
+    at.multiselect[0].set_value(["Ana"]).run()
+    assert _preparar_pdf(at)
+    assert len(gerados) == 2 and _pessoas_no_pdf(at) == {"Ana"}
+    at.multiselect[0].set_value([]).run()
+    assert _preparar_pdf(at)
+    assert len(gerados) == 3
+
+    # O inventário mudou (peça excluída): o PDF guardado já não serve.
+    _excluir(at, [linhas[2]['id']])
+    at.radio(key="menu_radio").set_value("Ver Relatório Completo").run()
+    assert not at.session_state.relatorio_cache
+    assert _preparar_pdf(at)
+    assert len(gerados) == 4 and _pessoas_no_pdf(at) == {"Ana", "Bia"}
+
+
+# --- Exclusão em lote ---
+def _pecas_com_foto(servidor, user_id, n):
+    linhas = []
+    for i in range(n):
+        linha = _linha(user_id, f"Pessoa {i}")  # rótulos distintos na lista de seleção
+        linha['image_path'] = f"{linha['id']}/original.jpg"
+        for tamanho in ("original", *gravacao_atelie.TAMANHOS_FOTO):
+            servidor.ficheiros[f"fotos-pecas/{user_id}/{linha['id']}/{tamanho}.jpg"] = (b"jpg", "image/jpeg")
+        linhas.append(linha)
+    servidor.inserir_direto('pecas', linhas)
+    return linhas
+
+
+def _excluir(at, ids):
+    at.session_state["menu_radio"] = "Excluir Peça"
+    at.run()
+    at.multiselect(key="pecas_exclusao").set_value(ids).run()
+    next(b for b in at.button if b.label.startswith("Confirmar Exclusão")).click().run()
+
+
+def _contar_deletes(monkeypatch, falhar_no=None):
+    """Conta os delete() a 'pecas' e os tamanhos dos lotes; com `falhar_no`, esse delete (1, 2, ...) falha."""
+    lotes = []
+    executar = supabase_local.ClienteLocal._executar
+
+    def _executar(self, consulta):
+        if consulta.tabela == 'pecas' and consulta.operacao == 'delete':
+            lotes.append(sum(1 for l in self.servidor.linhas('pecas') if all(f(l) for f in consulta.filtros)))
+            if len(lotes) == falhar_no:
+                raise supabase_local.ErroLocal("canceling statement due to statement timeout")
+        return executar(self, consulta)
+    monkeypatch.setattr(supabase_local.ClienteLocal, "_executar", _executar)
+    return lotes
+
+
+def test_exclusao_em_lotes(ambiente, abrir_app, monkeypatch):
+    servidor, cache, resposta = ambiente
+    linhas = _pecas_com_foto(servidor, resposta.user.id, 201)
+    lotes = _contar_deletes(monkeypatch)
+    at = abrir_app()
+
+    _excluir(at, [l['id'] for l in linhas])
+
+    assert not at.exception and not at.error
+    assert lotes == [200, 1]
+    assert servidor.tabelas['pecas'] == {} and servidor.ficheiros == {}
+    assert at.session_state.inventario == [] and cache.carregar(resposta.user.id) == []
+
+
+def test_exclusao_parcial_deixa_selecionadas_as_que_falharam(ambiente, abrir_app, monkeypatch):
+    servidor, cache, resposta = ambiente
+    _pecas_com_foto(servidor, resposta.user.id, 201)
+    _contar_deletes(monkeypatch, falhar_no=2)
+    at = abrir_app()
+    at.run()
+    ordem = [p.id for p in at.session_state.inventario]  # como a lista da página (mais recentes primeiro)
+
+    _excluir(at, ordem)
+
+    assert not at.exception
+    assert [e.value for e in at.error] == [
+        "Erro ao excluir os dados da peça: canceling statement due to statement timeout",
+        "Falha ao excluir algumas peças: 200 excluída(s), 1 por excluir."]
+    restante = ordem[200]
+    assert set(servidor.tabelas['pecas']) == {restante}
+    # Só as fotos das peças apagadas saem do bucket.
+    assert servidor.ficheiros and all(f"/{restante}/" in c for c in servidor.ficheiros)
+    assert [p.id for p in at.session_state.inventario] == [restante]
+    at.run()
+    assert at.multiselect(key="pecas_exclusao").value == [restante]
+    assert next(b for b in at.button if b.label.startswith("Confirmar Exclusão")).label.endswith(" 1 peça(s)")
+
+
+# --- Fila de gravação na barra lateral ---
+def test_descartar_com_erro_no_storage_mantem_a_peca_na_fila(ambiente, abrir_app, monkeypatch, esperar):
+    servidor, cache, resposta = ambiente
+    monkeypatch.setattr(gravacao_atelie, "MAX_TENTATIVAS_GRAVACAO", 1)
+    at = abrir_app()
+    at.run()
+    fila = at.session_state.fila_gravacao
+    peca = Peca.from_dict({**_linha(resposta.user.id, "Ana"), "image_path": "x/original.jpg"})
+
+    esperar_rede = servidor.esperar
+
+    def _offline():
+        raise ConnectionError("sem rede")
+    monkeypatch.setattr(servidor, "esperar", _offline)
+    fila.enfileirar(peca)
+    assert esperar(lambda: fila.estado() and fila.estado()[0][1] == "falhou")
+    at.run()
+
+    at.button(key=f"fila_descartar_{peca.id}").click().run()
+    assert not at.exception
+    assert any(e.value == "Erro ao excluir a foto: sem rede" for e in at.error)
+    assert peca.id in fila
+
+    monkeypatch.setattr(servidor, "esperar", esperar_rede)
+    at.button(key=f"fila_descartar_{peca.id}").click().run()
+    assert not at.exception
+    assert peca.id not in fila
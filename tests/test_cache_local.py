@@ -0,0 +1,55 @@
+# Cópia local do inventário (cache_local.py): linhas, peças por gravar e metadados, por utilizador.
+import pytest
+
+from cache_local import CacheLocal
+from modelo_atelie import Peca
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return CacheLocal(str(tmp_path / "cache.sqlite3"))
+
+
+def _linha(pessoa, created_at=None):
+    linha = Peca("10/03/2024", pessoa, "Vaso", 1.0, 10, 10, 10, user_id="u1").to_dict()
+    if created_at:
+        linha['created_at'] = created_at
+    return linha
+
+
+def test_carregar_das_mais_recentes_para_as_mais_antigas(cache):
+    antiga, recente, sem_data = _linha("Ana", "2024-01-01"), _linha("Bia", "2024-02-01"), _linha("Caio")
+    cache.guardar("u1", [antiga, recente, sem_data])
+    assert [l['id'] for l in cache.carregar("u1")] == [sem_data['id'], recente['id'], antiga['id']]
+    assert cache.carregar("u2") == []
+
+
+def test_versao_local_sem_created_at_nao_apaga_o_do_servidor(cache):
+    linha = _linha("Ana", "2024-01-01")
+    cache.guardar("u1", [linha])
+    alterada = {**linha, 'total': 99.0}
+    del alterada['created_at']
+    cache.guardar("u1", [alterada, _linha("Bia", "2024-02-01")])
+    assert [l['total'] for l in cache.carregar("u1")] == [26.0, 99.0]
+    cache.remover("u1", [linha['id']])
+    assert [l['nome_pessoa'] for l in cache.carregar("u1")] == ["Bia"]
+
+
+def test_pendentes_pela_ordem_de_criacao(cache):
+    primeira, segunda = _linha("Ana"), _linha("Bia")
+    cache.adicionar_pendente("u1", primeira, b"foto")
+    cache.adicionar_pendente("u1", segunda)
+    assert cache.listar_pendentes("u1") == [(primeira, b"foto"), (segunda, None)]
+    cache.remover_pendente("u1", primeira['id'])
+    cache.remover("u1", [segunda['id']])
+    assert cache.listar_pendentes("u1") == []
+
+
+def test_meta_por_utilizador(cache):
+    assert cache.get_meta("u1", "carga_offset", 0) == 0
+    cache.set_meta("u1", "carga_offset", 500)
+    cache.set_meta("u1", "tabelas_precos", [{"vigente_desde": "2024-01-01"}])
+    cache.set_meta("u2", "carga_offset", 7)
+    assert cache.get_meta("u1", "carga_offset") == 500
+    assert cache.get_meta("u1", "tabelas_precos") == [{"vigente_desde": "2024-01-01"}]
+    assert cache.get_meta("u2", "carga_offset") == 7
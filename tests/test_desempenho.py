@@ -0,0 +1,88 @@
+# Medições de desempenho (desempenho.py), sem Streamlit.
+import json
+import logging
+
+import pytest
+
+import desempenho
+import supabase_local
+from modelo_atelie import Peca
+
+
+def test_so_um_perfil_de_cada_vez():
+    perfil = desempenho.iniciar_perfil()
+    assert perfil is not None
+    try:
+        assert desempenho.iniciar_perfil() is None
+    finally:
+        resultado = desempenho.terminar_perfil(perfil)
+    assert resultado["texto"] and resultado["dados"]
+    # Terminado o primeiro, outro perfil já pode começar.
+    outro = desempenho.iniciar_perfil()
+    assert outro is not None
+    desempenho.terminar_perfil(outro)
+
+
+def _operacoes(execucao):
+    return {(l["categoria"], l["operacao"]): l for l in execucao.linhas()}
+
+
+def test_cliente_medido_conta_chamadas_bytes_e_erros(cliente, foto):
+    medicoes = desempenho.Medicoes()
+    medido = desempenho.ClienteMedido(cliente, medicoes)
+    linha = Peca("10/03/2024", "Ana", "Vaso", 1.0, 10, 10, 10, user_id=cliente.auth.sessao.user.id).to_dict()
+    medido.table('pecas').insert(linha).execute()
+    medido.table('pecas').select('*').eq('id', linha['id']).execute()
+    medido.rpc('resumo_pecas_por_pessoa', {}).execute()
+    # Sem contar_bytes, os bytes das consultas ficam a 0 (serializar as respostas custa); os das fotos contam sempre.
+    assert _operacoes(medicoes.atual)[("tabela:pecas", "insert")]["bytes_enviados"] == 0
+
+    medicoes.contar_bytes = True
+    resposta = medido.table('pecas').select('*').execute()
+    medido.storage.from_('fotos-pecas').upload("a.png", foto)
+    assert medido.storage.from_('fotos-pecas').download("a.png") == foto
+    medido.table('pecas').update({'total': 2.0}).eq('id', linha['id']).execute()
+    cliente.auth.sessao.expires_at = 0
+    with pytest.raises(supabase_local.ErroLocal, match="JWT"):
+        medido.table('pecas').delete().eq('id', linha['id']).execute()
+
+    operacoes = _operacoes(medicoes.atual)
+    assert operacoes[("tabela:pecas", "select")]["chamadas"] == 2
+    assert operacoes[("tabela:pecas", "select")]["bytes_recebidos"] == desempenho.tamanho_json(resposta.data) > 0
+    assert operacoes[("rpc:resumo_pecas_por_pessoa", "chamar")]["chamadas"] == 1
+    assert operacoes[("storage:fotos-pecas", "upload")]["bytes_enviados"] == len(foto)
+    assert operacoes[("storage:fotos-pecas", "download")]["bytes_recebidos"] == len(foto)
+    assert operacoes[("tabela:pecas", "update")]["bytes_enviados"] == desempenho.tamanho_json({'total': 2.0})
+    assert operacoes[("tabela:pecas", "delete")]["erros"] == 1
+    # A autenticação passa direto, sem medição.
+    assert medido.auth is cliente.auth
+    assert medicoes.atual.totais()["chamadas"] == sum(l["chamadas"] for l in operacoes.values()) == 8
+
+
+def test_execucoes_fecham_e_o_segundo_plano_so_fica_se_tiver_trabalho(caplog):
+    caplog.set_level(logging.INFO, logger="atelie.desempenho")
+    medicoes = desempenho.Medicoes(historico=2)
+    medicoes.iniciar_execucao(sessao="s1", user_id="u1", pagina="Relatório")
+    medicoes.registar("relatorio", "filtrar", 0.5)
+    primeira = medicoes.terminar_execucao()
+    assert primeira.completa and primeira.duracao_s is not None
+    # O segundo plano herda só a sessão e o utilizador, e sem operações não é registado.
+    assert medicoes.atual.numero is None and medicoes.atual.contexto == {"sessao": "s1", "user_id": "u1"}
+    medicoes.iniciar_execucao(sessao="s1", user_id="u1")
+    assert list(medicoes.anteriores) == [primeira]
+
+    # Interrompida a meio (ex.: st.rerun): fecha incompleta quando a seguinte começa.
+    with medicoes.medir("relatorio", "pdf"):
+        pass
+    medicoes.iniciar_execucao(sessao="s1", user_id="u1")
+    interrompida = medicoes.anteriores[-1]
+    assert interrompida.numero == 2 and not interrompida.completa
+    medicoes.terminar_execucao()
+    medicoes.registar("tabela:pecas", "upsert", 0.1)  # fila de gravação entre execuções
+    medicoes.iniciar_execucao(sessao="s1", user_id="u1")
+
+    assert [e.numero for e in medicoes.anteriores] == [3, None]  # histórico limitado às 2 últimas
+    eventos = [json.loads(r.getMessage()) for r in caplog.records]
+    assert [(e["evento"], e["numero"], e["completa"]) for e in eventos] == [
+        ("execucao", 1, True), ("execucao", 2, False), ("execucao", 3, True), ("segundo_plano", None, False)]
+    assert eventos[0]["pagina"] == "Relatório" and eventos[0]["operacoes"][0]["segundos"] == 0.5
@@ -0,0 +1,183 @@
+# Fila de gravação em segundo plano (gravacao_atelie.py) sobre o substituto local do Supabase.
+import io
+import threading
+import time
+from urllib.parse import unquote
+
+import pytest
+from PIL import Image
+
+import gravacao_atelie
+from cache_local import CacheLocal
+from gravacao_atelie import FilaGravacao
+from modelo_atelie import Peca
+
+
+def _peca(cliente, pessoa="Ana"):
+    return Peca("10/03/2024", pessoa, "Vaso", 1.0, 10, 10, 10, user_id=cliente.auth.sessao.user.id)
+
+
+def test_preparar_fotos_endireita_e_gera_os_tamanhos():
+    # PNG transparente de 640x480 com EXIF "rodar 90°" (orientação 6): fica 480x640, em JPEG com fundo branco.
+    buffer = io.BytesIO()
+    exif = Image.Exif()
+    exif[0x0112] = 6
+    Image.new("RGBA", (640, 480), (0, 0, 0, 0)).save(buffer, format="PNG", exif=exif)
+
+    fotos = gravacao_atelie.preparar_fotos(buffer.getvalue())
+    assert set(fotos) == {"original", *gravacao_atelie.TAMANHOS_FOTO}
+    imagens = {tamanho: Image.open(io.BytesIO(dados)) for tamanho, dados in fotos.items()}
+    assert {img.format for img in imagens.values()} == {"JPEG"}
+    assert imagens["original"].size == (480, 640)
+    assert imagens["original"].getpixel((10, 10)) > (250, 250, 250)
+    for tamanho, lado in gravacao_atelie.TAMANHOS_FOTO.items():
+        assert imagens[tamanho].size == (lado * 3 // 4, lado)
+
+
+def test_url_publica_usa_o_derivado_so_quando_a_peca_o_tem(cliente):
+    peca = _peca(cliente)
+    assert gravacao_atelie.url_publica(cliente, peca, "thumb") is None
+
+    def _caminho(url):
+        return unquote(url).split("/fotos-pecas/", 1)[1]
+    peca.image_path = f"{peca.id}/original.jpg"
+    assert _caminho(gravacao_atelie.url_publica(cliente, peca)) == f"{peca.user_id}/{peca.id}/original.jpg"
+    assert _caminho(gravacao_atelie.url_publica(cliente, peca, "thumb")) == f"{peca.user_id}/{peca.id}/thumb.jpg"
+    assert _caminho(gravacao_atelie.url_publica(cliente, peca, "enorme")) == f"{peca.user_id}/{peca.id}/original.jpg"
+    # Peças antigas têm só a foto original na raiz da pasta do utilizador, sem derivados.
+    peca.image_path = "vaso.jpg"
+    assert _caminho(gravacao_atelie.url_publica(cliente, peca, "thumb")) == f"{peca.user_id}/vaso.jpg"
+    assert gravacao_atelie.caminhos_foto(peca) == [f"{peca.user_id}/vaso.jpg"]
+
+
+def test_grava_a_peca_e_as_fotos_e_sai_dos_pendentes(cliente, tmp_path, esperar, foto):
+    cache = CacheLocal(str(tmp_path / "cache.sqlite3"))
+    fila = FilaGravacao(cliente, cache)
+    peca = _peca(cliente)
+    fila.enfileirar(peca, foto)
+    assert cache.listar_pendentes(peca.user_id)
+
+    assert esperar(lambda: fila.concluidas == 1)
+    servidor = cliente.servidor
+    assert servidor.tabelas['pecas'][peca.id]['image_path'] == f"{peca.id}/original.jpg"
+    assert {f"fotos-pecas/{c}" for c in gravacao_atelie.caminhos_foto(peca)} <= set(servidor.ficheiros)
+    assert peca.id not in fila
+    assert not cache.listar_pendentes(peca.user_id)
+    # A cópia local passa a ser a linha do servidor, com 'created_at'.
+    assert cache.carregar(peca.user_id)[0]['created_at'] == servidor.tabelas['pecas'][peca.id]['created_at']
+
+
+def test_tenta_de_novo_com_espera_e_desiste_depois_do_maximo(cliente, monkeypatch, esperar):
+    servidor = cliente.servidor
+    falhas = {"restantes": 2}
+    esperar_rede = servidor.esperar
+
+    def _instavel():
+        if falhas["restantes"]:
+            falhas["restantes"] -= 1
+            raise ConnectionError("sem rede")
+        esperar_rede()
+    monkeypatch.setattr(servidor, "esperar", _instavel)
+    fila = FilaGravacao(cliente)
+    peca = _peca(cliente)
+    fila.enfileirar(peca)
+    assert esperar(lambda: fila.concluidas == 1)
+    assert peca.id in servidor.tabelas['pecas']
+
+    falhas["restantes"] = gravacao_atelie.MAX_TENTATIVAS_GRAVACAO
+    outra = _peca(cliente, "Bia")
+    fila.enfileirar(outra)
+    assert esperar(lambda: fila.estado() and fila.estado()[0][1] == "falhou")
+    assert fila.estado()[0][2] == gravacao_atelie.MAX_TENTATIVAS_GRAVACAO
+    fila.tentar_novamente(outra.id)
+    assert esperar(lambda: fila.concluidas == 2)
+    assert outra.id in servidor.tabelas['pecas']
+
+
+def test_renova_a_sessao_expirada(cliente, esperar):
+    cliente.auth.sessao.expires_at = 0
+    fila = FilaGravacao(cliente)
+    peca = _peca(cliente)
+    fila.enfileirar(peca)
+
+    assert esperar(lambda: fila.concluidas == 1)
+    sessao = fila.tomar_sessao_renovada()
+    assert sessao and sessao['expires_at'] > time.time()
+    assert fila.tomar_sessao_renovada() is None
+
+
+def test_reservadas_nao_sao_gravadas_ate_serem_libertadas(cliente, monkeypatch, esperar):
+    servidor = cliente.servidor
+    rede = {"ligada": False}
+    esperar_rede = servidor.esperar
+
+    def _talvez_offline():
+        if not rede["ligada"]:
+            raise ConnectionError("sem rede")
+        esperar_rede()
+    monkeypatch.setattr(servidor, "esperar", _talvez_offline)
+    fila = FilaGravacao(cliente)
+    peca = _peca(cliente)
+    fila.enfileirar(peca)
+    assert esperar(lambda: fila.estado()[0][1] == "falhou")
+    assert fila.reservar([peca.id]) == [peca.id]
+
+    rede["ligada"] = True
+    fila.tentar_novamente(peca.id)  # só vale para as que falharam; esta está suspensa
+    time.sleep(0.1)
+    assert peca.id not in servidor.tabelas['pecas']
+    fila.libertar([peca.id])
+    fila.tentar_novamente(peca.id)
+    assert esperar(lambda: fila.concluidas == 1)
+    assert peca.id in servidor.tabelas['pecas']
+
+
+def test_exclusao_espera_pela_gravacao_em_curso(cliente, monkeypatch, esperar):
+    servidor = cliente.servidor
+    a_gravar, continuar = threading.Event(), threading.Event()
+    esperar_rede = servidor.esperar
+
+    def _upsert_lento():
+        if not a_gravar.is_set():
+            a_gravar.set()
+            continuar.wait(5)
+        esperar_rede()
+    monkeypatch.setattr(servidor, "esperar", _upsert_lento)
+    fila = FilaGravacao(cliente)
+    peca = _peca(cliente)
+    fila.enfileirar(peca)
+    assert a_gravar.wait(5) and fila.estado()[0][1] == "a_gravar"
+
+    # Como excluir_pecas_db: reservar, apagar no servidor e retirar da fila.
+    def _excluir():
+        fila.reservar([peca.id])
+        cliente.table('pecas').delete().in_('id', [peca.id]).execute()
+        fila.cancelar([peca.id])
+    exclusao = threading.Thread(target=_excluir)
+    exclusao.start()
+    exclusao.join(0.2)
+    assert exclusao.is_alive()  # à espera do upsert em curso
+    continuar.set()
+    exclusao.join(5)
+    assert not exclusao.is_alive()
+    assert fila.concluidas == 1
+    assert peca.id not in servidor.tabelas['pecas']
+
+
+def test_reservar_desiste_se_a_gravacao_nao_terminar(cliente, monkeypatch, esperar):
+    servidor = cliente.servidor
+    a_gravar, continuar = threading.Event(), threading.Event()
+
+    def _pendurado():
+        a_gravar.set()
+        continuar.wait(5)
+    monkeypatch.setattr(servidor, "esperar", _pendurado)
+    fila = FilaGravacao(cliente)
+    peca = _peca(cliente)
+    fila.enfileirar(peca)
+    assert a_gravar.wait(5)
+    with pytest.raises(TimeoutError):
+        fila.reservar([peca.id], espera_max=0.05)
+    assert fila.estado()[0][1] == "a_gravar"
+    continuar.set()
+    assert esperar(lambda: fila.concluidas == 1)
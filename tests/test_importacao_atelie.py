@@ -0,0 +1,83 @@
+# Importação em lote (importacao_atelie.py) sobre o substituto local do Supabase.
+import io
+import zipfile
+
+import pytest
+
+import importacao_atelie
+import supabase_local
+from importacao_atelie import importar_pecas, ler_ficheiro_importacao, validar_linha_importacao
+
+
+def _zip(tabela, fotos):
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w") as arquivo:
+        arquivo.writestr("pecas.csv", tabela)
+        for nome, dados in fotos.items():
+            arquivo.writestr(f"fotos/{nome}", dados)
+    return buffer.getvalue()
+
+
+def _fotos_no_bucket(servidor, peca):
+    return {c for c in servidor.ficheiros if c.startswith(f"{importacao_atelie.NOME_BUCKET_FOTOS}/{peca.user_id}/{peca.id}/")}
+
+
+@pytest.mark.parametrize("coluna, valor", [("peso_kg", "nan"), ("altura_cm", "inf"), ("preco_argila_propria", "-inf")])
+def test_valores_nao_finitos_sao_recusados(coluna, valor):
+    linha = {"data_producao": "10/03/2024", "nome_pessoa": "Ana", "tipo_peca": "Vaso", "peso_kg": "1,2", coluna: valor}
+    with pytest.raises(ValueError, match="finitos"):
+        validar_linha_importacao(linha, "u1")
+
+
+def test_csv_com_ponto_e_virgula_e_decimais_com_virgula():
+    tabela = ("data_producao;nome_pessoa;tipo_peca;peso_kg;altura_cm;largura_cm;profundidade_cm;tipo_argila\n"
+              "10/03/2024;Ana;Vaso;1,5;10;12,5;8;atelie\n"
+              "11/03/2024;Bia;Copo;0,3;9;7;7;\n")
+    linhas, fotos = ler_ficheiro_importacao("pecas.csv", tabela.encode("utf-8"))
+    assert fotos == {}
+    assert [numero for numero, _ in linhas] == [2, 3]
+    pecas = [validar_linha_importacao(linha, "u1") for _, linha in linhas]
+    assert [(p.nome_pessoa, p.peso_kg, p.largura_cm, p.tipo_argila) for p in pecas] == [
+        ("Ana", 1.5, 12.5, "atelie"), ("Bia", 0.3, 7.0, "nenhuma")]
+
+
+def test_zip_com_foto_em_falta(servidor, cliente, foto):
+    tabela = ("data_producao,nome_pessoa,tipo_peca,peso_kg,foto\n"
+              "10/03/2024,Ana,Vaso,1.0,vaso.png\n"
+              "11/03/2024,Bia,Copo,0.5,copo.png\n")
+    linhas, fotos = ler_ficheiro_importacao("lote.zip", _zip(tabela, {"vaso.png": foto}))
+    assert set(fotos) == {"vaso.png"}
+
+    resultado = importar_pecas(cliente, linhas, fotos, cliente.auth.sessao.user.id)
+    assert [p.nome_pessoa for p in resultado["importadas"]] == ["Ana"]
+    assert resultado["falhas"] == [(3, "Foto 'copo.png' não encontrada no ZIP.")]
+    assert set(servidor.tabelas["pecas"]) == {resultado["importadas"][0].id}
+    assert _fotos_no_bucket(servidor, resultado["importadas"][0])
+
+
+def test_lote_que_falha_apaga_as_suas_fotos(monkeypatch, servidor, cliente, foto):
+    monkeypatch.setattr(importacao_atelie, "TAMANHO_LOTE_INSERCAO", 1)
+    gravar = supabase_local.ClienteLocal._gravar
+
+    def _gravar_recusando_bia(self, consulta, user_id):
+        if any(linha["nome_pessoa"] == "Bia" for linha in consulta.dados):
+            raise supabase_local.ErroLocal("canceling statement due to statement timeout")
+        return gravar(self, consulta, user_id)
+
+    monkeypatch.setattr(supabase_local.ClienteLocal, "_gravar", _gravar_recusando_bia)
+    tabela = ("data_producao,nome_pessoa,tipo_peca,peso_kg,foto\n"
+              "10/03/2024,Ana,Vaso,1.0,vaso.png\n"
+              "11/03/2024,Bia,Copo,0.5,copo.png\n")
+    linhas, fotos = ler_ficheiro_importacao("lote.zip", _zip(tabela, {"vaso.png": foto, "copo.png": foto}))
+    progresso = []
+
+    resultado = importar_pecas(cliente, linhas, fotos, cliente.auth.sessao.user.id,
+                               lambda feitas, total: progresso.append((feitas, total)))
+    [ana] = resultado["importadas"]
+    assert ana.nome_pessoa == "Ana"
+    assert [(n, m.startswith("Erro ao salvar o lote")) for n, m in resultado["falhas"]] == [(3, True)]
+    assert progresso == [(1, 2), (2, 2)]
+    # Só ficam no bucket as fotos da peça gravada.
+    assert servidor.ficheiros and all(c.startswith(f"{importacao_atelie.NOME_BUCKET_FOTOS}/{ana.user_id}/{ana.id}/")
+                                      for c in servidor.ficheiros)
+    assert set(servidor.tabelas["pecas"]) == {ana.id}
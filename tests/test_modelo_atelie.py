@@ -0,0 +1,220 @@
+# Modelo de dados (modelo_atelie.py): preços por data, recálculo de custos, índice e agregados.
+import random
+from datetime import date
+
+import numpy as np
+import pytest
+
+from modelo_atelie import (Agregados, HistoricoPrecos, IndicePecas, Inventario, Peca, SimulacaoRecalculo,
+                           TABELA_PRECOS_BASE, TabelaPrecos, ordinal_data)
+
+V1 = TabelaPrecos(date(2024, 1, 1), 15.0, 0.015, 8.0)
+V2 = TabelaPrecos(date(2024, 7, 1), 17.0, 0.02, 9.5)
+
+
+@pytest.fixture
+def historico():
+    return HistoricoPrecos([V2, V1])  # fora de ordem de propósito
+
+
+# --- Preços por data ---
+@pytest.mark.parametrize("data_producao, esperada", [
+    ("31/12/2023", TABELA_PRECOS_BASE),
+    ("01/01/2024", V1),
+    ("30/06/2024", V1),
+    ("01/07/2024", V2),
+    ("15/03/2030", V2),
+])
+def test_tabela_em_nos_limites_das_versoes(historico, data_producao, esperada):
+    assert historico.tabela_em(data_producao) is esperada
+
+
+def test_tabela_em_sem_data_de_producao(historico):
+    assert historico.tabela_em("sem data", "31/12/2023") is TABELA_PRECOS_BASE
+    assert historico.tabela_em("", "02/01/2024") is V1
+    assert historico.tabela_em(None, None) is V2
+    assert historico.tabela_em("32/13/2024", "também inválida") is V2
+
+
+def test_precos_por_ordinal_igual_a_tabela_em(historico):
+    datas = ["31/12/2023", "01/01/2024", "30/06/2024", "01/07/2024", "sem data"]
+    ordinais = [ordinal_data(d) or 0 for d in datas]
+    precos = historico.precos_por_ordinal(ordinais)
+    for i, data_producao in enumerate(datas):
+        tabela = historico.tabela_em(data_producao)
+        for nome, coluna in precos.items():
+            assert coluna[i] == getattr(tabela, nome)
+
+
+def test_historico_vazio_so_tem_a_tabela_base():
+    historico = HistoricoPrecos()
+    assert historico.tabelas == [TABELA_PRECOS_BASE]
+    assert historico.precos_por_ordinal([0, date(2024, 1, 1).toordinal()])['preco_biscoito_kg'].tolist() == [13.0, 13.0]
+
+
+# --- Recálculo de custos ---
+def _linhas_aleatorias(n, seed=0):
+    aleatorio = random.Random(seed)
+    inicio = date(2023, 6, 1).toordinal()
+    linhas = []
+    for _ in range(n):
+        if aleatorio.random() < 0.05:
+            data_producao = "sem data"
+        else:
+            data_producao = date.fromordinal(inicio + aleatorio.randrange(500)).strftime("%d/%m/%Y")
+        data_registro = date.fromordinal(inicio + aleatorio.randrange(500)).strftime("%d/%m/%Y")
+        peca = Peca(data_producao, aleatorio.choice(["Ana", "Bia", "Caio"]), aleatorio.choice(["Vaso", "Copo"]),
+                    round(aleatorio.uniform(0.1, 4.0), 3), round(aleatorio.uniform(3, 40), 1),
+                    round(aleatorio.uniform(3, 40), 1), round(aleatorio.uniform(3, 40), 1),
+                    aleatorio.choice(["atelie", "propria", "nenhuma"]), round(aleatorio.uniform(4, 12), 2),
+                    data_registro=data_registro, recalcular=False)
+        linhas.append(peca.to_dict())
+    return linhas
+
+
+def test_recalculo_vetorizado_igual_ao_de_peca(historico):
+    linhas = _linhas_aleatorias(2000)
+    inventario = Inventario.from_dicts(linhas)
+    inventario.recalcular_custos(historico=historico)
+    for nome in ('custo_argila', 'custo_biscoito', 'custo_esmalte', 'total'):
+        esperado = []
+        for linha in linhas:
+            peca = Peca.from_dict(linha)
+            peca.recalcular_custos(historico)
+            esperado.append(getattr(peca, nome))
+        np.testing.assert_allclose(inventario.coluna(nome), esperado, rtol=1e-12)
+
+
+def test_extend_cresce_e_so_recalcula_as_linhas_novas(historico):
+    linhas = _linhas_aleatorias(5, seed=2)
+    guardadas = [{**linha, "total": 1234.0} for linha in linhas]
+    inventario = Inventario(capacidade=2)
+    inventario.extend(guardadas[:3])
+    inventario.extend(guardadas[3:], recalcular=True)
+    assert len(inventario) == 5 and len(inventario.coluna('total')) == 5
+    # As três primeiras mantêm o custo guardado; as outras são custeadas com o histórico por omissão.
+    assert inventario.coluna('total')[:3].tolist() == [1234.0] * 3
+    for i in (3, 4):
+        peca = Peca.from_dict(linhas[i])
+        peca.recalcular_custos()
+        assert inventario.coluna('total')[i] == pytest.approx(peca.total)
+    inventario.recalcular_custos(slice(0, 1), historico=historico)
+    assert inventario.coluna('total')[1:3].tolist() == [1234.0] * 2
+
+
+def test_preco_da_argila_propria_so_conta_com_argila_propria():
+    linhas = [{**Peca("10/03/2024", "Ana", "Vaso", 2.0, 10, 10, 10).to_dict(), "tipo_argila": tipo,
+               "preco_argila_propria": 5.0} for tipo in ("propria", "atelie", "nenhuma")]
+    inventario = Inventario.from_dicts(linhas)
+    inventario.recalcular_custos(historico=HistoricoPrecos())
+    assert inventario.coluna('preco_argila_propria').tolist() == [5.0, 0.0, 0.0]
+    assert inventario.coluna('custo_argila').tolist() == pytest.approx([10.0, 14.0, 0.0])
+
+
+def _linha_guardada(**custos):
+    # 1 kg, 10x10x10 cm, sem argila: com a tabela base, biscoito 13,00 + esmalte 13,00 = 26,00.
+    linha = Peca("10/03/2024", "Ana", "Vaso", 1.0, 10, 10, 10).to_dict()
+    linha.update(custos)
+    return linha
+
+
+def test_simulacao_so_altera_diferencas_de_pelo_menos_um_centimo():
+    historico = HistoricoPrecos()
+    iguais = _linha_guardada(custo_biscoito=13.004, total=26.004)
+    um_centimo = _linha_guardada(custo_biscoito=13.01, total=26.01)
+    simulacao = SimulacaoRecalculo(historico).processar([iguais, um_centimo])
+
+    assert simulacao.analisadas == 2
+    assert [l['id'] for l in simulacao.alteradas] == [um_centimo['id']]
+    assert simulacao.alteradas[0]['custo_biscoito'] == pytest.approx(13.0)
+    assert simulacao.alteradas[0]['total'] == pytest.approx(26.0)
+    assert simulacao.diferenca == pytest.approx(-0.014)
+    assert simulacao.resumo_por_pessoa() == [pytest.approx(
+        {"nome_pessoa": "Ana", "quantidade": 1, "total_antes": 26.01, "total_depois": 26.0, "diferenca": -0.01})]
+
+
+def test_simulacao_por_lotes_igual_a_um_so_lote(historico):
+    linhas = _linhas_aleatorias(300, seed=1)
+    inteira = SimulacaoRecalculo(historico).processar(linhas)
+    por_lotes = SimulacaoRecalculo(historico)
+    for inicio in range(0, len(linhas), 70):
+        por_lotes.processar(linhas[inicio:inicio + 70])
+    assert [l['id'] for l in por_lotes.alteradas] == [l['id'] for l in inteira.alteradas]
+    assert por_lotes.total_depois == pytest.approx(inteira.total_depois)
+
+
+# --- Índice e agregados ---
+def _peca(data_producao, pessoa="Ana", tipo="Vaso", peso=1.0):
+    return Peca(data_producao, pessoa, tipo, peso, 10, 10, 10, tipo_argila='atelie')
+
+
+def test_intervalo_inclui_as_duas_pontas():
+    antes, inicio, meio, fim, depois = (_peca(d) for d in
+                                        ("29/02/2024", "01/03/2024", "15/03/2024", "31/03/2024", "01/04/2024"))
+    indice = IndicePecas([fim, depois, antes, meio, inicio])
+
+    ids = indice.ids_no_intervalo(date(2024, 3, 1), date(2024, 3, 31))
+    assert ids == [inicio.id, meio.id, fim.id]
+    assert indice.ids_no_intervalo(fim=date(2024, 3, 31))[-1] == fim.id
+    assert indice.ids_no_intervalo(inicio=date(2024, 4, 1)) == [depois.id]
+    assert indice.consultar(inicio=date(2024, 3, 31), fim=date(2024, 3, 31)) == [fim]
+    # Mais recente primeiro.
+    assert indice.consultar(inicio=date(2024, 3, 1), fim=date(2024, 3, 31)) == [fim, meio, inicio]
+
+
+def test_grupo_sem_data():
+    com_data, sem_data, mal_formada = _peca("10/03/2024"), _peca("sem data", "Bia"), _peca("2024-03-10", "Bia")
+    indice = IndicePecas([com_data, sem_data, mal_formada])
+
+    assert indice.sem_data == {sem_data.id, mal_formada.id}
+    assert set(p.id for p in indice.consultar(sem_data=True)) == {sem_data.id, mal_formada.id}
+    assert [p.id for p in indice.consultar(sem_data=True, pessoas=("Ana",))] == []
+    assert indice.consultar(inicio=date(2000, 1, 1), fim=date(2100, 1, 1)) == [com_data]
+    # Sem filtros de data aparecem todas, as sem data no fim.
+    assert indice.consultar()[0] == com_data and len(indice.consultar()) == 3
+    assert indice.agregados.resumo(('mes',)) == [
+        {"mes": None, "quantidade": 2, **{c: 2 * getattr(sem_data, c) for c in ('custo_argila', 'custo_biscoito', 'custo_esmalte', 'total')}},
+        {"mes": "2024-03", "quantidade": 1, **{c: getattr(com_data, c) for c in ('custo_argila', 'custo_biscoito', 'custo_esmalte', 'total')}},
+    ]
+    indice.remover(sem_data.id)
+    assert indice.sem_data == {mal_formada.id}
+
+
+def _resumos(agregados):
+    # Somar e subtrair a mesma peça pode deixar restos de vírgula flutuante: compara-se ao décimo de cêntimo.
+    return {agrupar: [{k: round(v, 3) if isinstance(v, float) else v for k, v in linha.items()}
+                      for linha in agregados.resumo(agrupar)]
+            for agrupar in (('nome_pessoa',), ('mes',), ('tipo_peca',), ('nome_pessoa', 'mes', 'tipo_peca'))}
+
+
+def test_agregados_acompanham_adicionar_substituir_e_remover():
+    pecas = [_peca(d, p, t, peso) for d, p, t, peso in (
+        ("10/01/2024", "Ana", "Vaso", 1.0), ("20/01/2024", "Ana", "Copo", 2.0),
+        ("05/02/2024", "Bia", "Vaso", 0.5), ("sem data", "Caio", "Prato", 3.0))]
+    indice = IndicePecas(pecas)
+    assert _resumos(indice.agregados) == _resumos(Agregados(pecas))
+
+    # Substituir: a mesma peça com outra pessoa, data e custo (como uma linha recebida do servidor).
+    alterada = Peca.from_dict({**pecas[0].to_dict(), "nome_pessoa": "Bia", "data_producao": "01/03/2024", "total": 99.0})
+    indice.adicionar(alterada)
+    atuais = [alterada] + pecas[1:]
+    assert len(indice.agregados) == 4
+    assert _resumos(indice.agregados) == _resumos(Agregados(atuais))
+    assert indice.ids_por_pessoas(("Ana",)) == {pecas[1].id}
+
+    # Remover: as células que ficam vazias desaparecem.
+    indice.remover(pecas[3].id)
+    indice.remover(pecas[1].id)
+    assert _resumos(indice.agregados) == _resumos(Agregados([alterada, pecas[2]]))
+    assert {chave[0] for chave in indice.agregados.celulas} == {"Bia"}
+    assert "Ana" not in indice.por_pessoa
+    indice.remover("nao-existe")
+    assert len(indice) == len(indice.agregados) == 2
+
+
+def test_resumo_por_meses_e_pessoas():
+    pecas = [_peca("10/01/2024", "Ana"), _peca("10/02/2024", "Ana"), _peca("10/02/2024", "Bia"), _peca("sem data", "Ana")]
+    agregados = Agregados(pecas)
+    linhas = agregados.resumo(('nome_pessoa',), pessoas=("Ana",), mes_inicio="2024-02", mes_fim="2024-02")
+    assert [(l["nome_pessoa"], l["quantidade"]) for l in linhas] == [("Ana", 1)]
+    assert [l["quantidade"] for l in agregados.resumo(('nome_pessoa',), sem_data=True)] == [1]
@@ -0,0 +1,108 @@
+# Geração do relatório em PDF (relatorio_pdf.py), sem Streamlit.
+import io
+import re
+import sys
+import time
+import types
+
+import pytest
+from PIL import Image
+from pypdf import PdfReader
+
+import relatorio_pdf
+from modelo_atelie import Peca
+from relatorio_pdf import CacheFotos, DPI_FOTO_PDF, LARGURA_FOTO_PDF_MM, LIMITE_CACHE_FOTOS_BYTES, prefetch_fotos
+
+
+def test_cache_fotos_descarta_as_menos_usadas_pelo_total_de_bytes():
+    cache = CacheFotos(limite_bytes=10)
+    cache.put("a", b"1234")
+    cache.put("b", b"1234")
+    assert cache.get("a") == b"1234"  # "a" passa a ser a mais recente
+    cache.put("c", b"1234")
+
+    assert cache.get("b") is None
+    assert cache.get("a") == cache.get("c") == b"1234"
+    assert cache.total_bytes == 8
+    cache.put("grande", b"x" * 11)  # maior do que o limite: não entra nem expulsa as outras
+    assert cache.get("grande") is None
+    assert cache.total_bytes == 8
+
+
+def test_prefetch_fotos_reduz_usa_a_cache_e_tolera_falhas(monkeypatch, servidor, cliente):
+    foto = io.BytesIO()
+    Image.new("RGB", (800, 600), (10, 90, 200)).save(foto, format="JPEG")
+    bucket = cliente.storage.from_("fotos-pecas")
+    bucket.upload("u1/ana/impressao.jpg", foto.getvalue(), {"content-type": "image/jpeg"})
+    url = bucket.get_public_url("u1/ana/impressao.jpg")
+    pecas = [Peca("10/03/2024", p, "Vaso", 1.0, 10, 10, 10) for p in ("Ana", "Bia", "Caio")]
+    urls = {pecas[0].id: url, pecas[1].id: bucket.get_public_url("u1/bia/impressao.jpg"), pecas[2].id: None}
+    cache = CacheFotos(LIMITE_CACHE_FOTOS_BYTES)
+    servidor.latencia, pedidos = 0.2, servidor.pedidos
+
+    inicio = time.monotonic()
+    fotos = prefetch_fotos(pecas, lambda peca: urls[peca.id], cache)
+
+    # Os dois downloads passam pela "rede" do servidor local, em paralelo.
+    assert servidor.pedidos - pedidos == 2
+    assert 0.2 <= time.monotonic() - inicio < 0.4
+    assert fotos[pecas[1].id] is None and fotos[pecas[2].id] is None  # 404 e sem foto
+    reduzida = Image.open(io.BytesIO(fotos[pecas[0].id]))
+    assert max(reduzida.size) <= round(LARGURA_FOTO_PDF_MM / 25.4 * DPI_FOTO_PDF)
+    assert cache.get(url) == fotos[pecas[0].id]
+    # Com a foto na cache, não volta a ser descarregada.
+    monkeypatch.setattr(relatorio_pdf, "baixar_foto", lambda *_: pytest.fail("descarregou de novo"))
+    assert prefetch_fotos(pecas[:1], lambda peca: url, cache) == {pecas[0].id: fotos[pecas[0].id]}
+
+
+def _pecas_de_alturas_variadas(n):
+    # Nomes compridos partem as linhas do texto em duas ou três: as peças não têm todas a mesma altura.
+    return [Peca("10/03/2024", f"P{i:03d}" + " Silva" * (i % 5 * 12), "Vaso", 1.0, 10, 10, 10) for i in range(n)]
+
+
+def _pessoas_por_folha(pdf_bytes):
+    return [re.findall(r"P\d{3}", folha.extract_text()) for folha in PdfReader(io.BytesIO(pdf_bytes)).pages]
+
+
+def test_paginar_nao_parte_pecas_e_mantem_a_ordem():
+    pecas = _pecas_de_alturas_variadas(40)
+    paginas = relatorio_pdf.paginar(pecas)
+
+    assert relatorio_pdf.paginar([]) == []
+    assert [p for pagina in paginas for p in pagina] == pecas
+    assert all(paginas)
+    # Desenhadas página a página, nenhuma peça passa para a folha seguinte (o fpdf acrescentaria folhas).
+    folhas = _pessoas_por_folha(relatorio_pdf.gerar_secao(paginas, {}, titulo=True))
+    assert folhas == [[p.nome_pessoa[:4] for p in pagina] for pagina in paginas]
+
+
+def test_relatorio_em_secoes_tem_as_paginas_de_paginar_pela_ordem(monkeypatch):
+    monkeypatch.setattr(relatorio_pdf, "PAGINAS_POR_SECAO", 2)
+    pecas = _pecas_de_alturas_variadas(50)
+    paginas = relatorio_pdf.paginar(pecas)
+    assert len(paginas) > 4  # três secções ou mais
+
+    saida = io.BytesIO()
+    relatorio_pdf.gerar_relatorio(pecas, [{"nome_pessoa": "Ana", "total": 1.0}], lambda lote: {}, saida, processos=2)
+
+    # Cada página na sua folha, pela ordem, depois de juntar as secções.
+    assert _pessoas_por_folha(saida.getvalue()) == [[p.nome_pessoa[:4] for p in pagina] for pagina in paginas]
+
+
+def test_secoes_em_paralelo_nao_executam_o_script_principal(monkeypatch, tmp_path):
+    # Como no Streamlit: o __main__ é o script da app, que não pode correr nos processos de trabalho.
+    script = tmp_path / "app.py"
+    script.write_text("raise SystemExit('o script da app correu num processo de trabalho')\n")
+    principal = types.ModuleType("__main__")
+    principal.__file__ = str(script)
+    monkeypatch.setitem(sys.modules, "__main__", principal)
+    monkeypatch.setattr(relatorio_pdf, "PAGINAS_POR_SECAO", 2)
+    pecas = [Peca("10/03/2024", f"Pessoa {i}", "Vaso", 1.0, 10, 10, 10) for i in range(60)]
+    paginas = relatorio_pdf.paginar(pecas)
+    assert len(paginas) > 4  # três secções ou mais
+
+    saida = io.BytesIO()
+    relatorio_pdf.gerar_relatorio(pecas, [{"nome_pessoa": "Ana", "total": 1.0}], lambda lote: {}, saida, processos=2)
+
+    assert sys.modules["__main__"] is principal
+    assert len(PdfReader(io.BytesIO(saida.getvalue())).pages) == len(paginas)